@@ -2,13 +2,12 @@
 API route handlers.
 """
 import logging
-import os
 from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from pydantic import ValidationError
 
 from app.models import ExecRequest, ExecResult
-from app.core import CodeExecutor, RuntimeManager, SandboxManager
+from app.core import CodeExecutor, runtime_manager, sandbox_manager
 from app.exceptions import CodeEngineException
 
 logger = logging.getLogger(__name__)
@@ -34,23 +33,7 @@ async def root():
 @router.get("/api/v2/runtimes")
 async def get_runtimes():
     """Get available runtimes."""
-    runtimes = []
-    
-    for language, config in RuntimeManager.SUPPORTED_LANGUAGES.items():
-        base_dir = config['base_dir']
-        if os.path.isdir(base_dir):
-            versions = [
-                d for d in os.listdir(base_dir)
-                if os.path.isdir(os.path.join(base_dir, d))
-            ]
-            for version in sorted(versions):
-                runtimes.append({
-                    "language": language,
-                    "version": version,
-                    "runtime": f"{language}-{version}"
-                })
-    
-    return {"runtimes": runtimes}
+    return {"runtimes": runtime_manager.list_runtimes()}
 
 
 @router.post("/api/v2/execute", response_model=ExecResult)
@@ -58,6 +41,9 @@ async def execute(request: ExecRequest):
     """
     Execute code in a sandboxed environment.
     
+    The child process is supervised with asyncio, so the handler runs on
+    the event loop without tying up a threadpool worker per execution.
+    
     Args:
         request: ExecRequest containing code and execution parameters
         
@@ -65,8 +51,10 @@ async def execute(request: ExecRequest):
         ExecResult with execution output and metadata
     """
     try:
-        result = executor.execute_code(request)
-        return result
+        result = await executor.execute_code_async(request)
+        # The result is built by the executor, so skip response_model
+        # re-validation and serialize it directly with orjson
+        return ORJSONResponse(content=result.model_dump())
         
     except ValidationError as e:
         logger.error(f"Validation error: {str(e)}")
@@ -89,14 +77,23 @@ async def execute(request: ExecRequest):
 
 
 @router.get("/health")
-async def health_check():
-    """Health check endpoint."""
-    bwrap_available = SandboxManager.validate_bubblewrap_available()
-    bwrap_working = SandboxManager.check_bubblewrap_working() if bwrap_available else False
+def health_check(force_refresh: bool = False):
+    """
+    Health check endpoint.
+    
+    Sandbox detection is cached; pass ``force_refresh=true`` to probe
+    bubblewrap again (this may spawn bwrap, so the handler runs in the
+    threadpool). A failed re-probe is reported as degraded but never
+    switches jobs out of the sandbox.
+    """
+    bwrap_available, bwrap_working = sandbox_manager.get_status(force_refresh=force_refresh)
     
     if bwrap_working:
         status = "healthy"
         mode = "sandboxed (bubblewrap)"
+    elif sandbox_manager.check_bubblewrap_working():
+        status = "degraded"
+        mode = "sandboxed (bubblewrap re-check failed)"
     elif bwrap_available:
         status = "degraded"
         mode = "direct (bubblewrap installed but not working)"
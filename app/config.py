@@ -1,7 +1,6 @@
 """
 Configuration management for the code execution engine.
 """
-import os
 from pydantic_settings import BaseSettings
 from typing import Optional
 
@@ -13,6 +12,7 @@ class Settings(BaseSettings):
     api_title: str = "Code Execution Engine"
     api_version: str = "2.0.0"
     api_description: str = "A secure code execution engine similar to Piston"
+    enable_cors: bool = True  # Set to False when the API is only called server-to-server
     
     # Server Settings
     host: str = "0.0.0.0"
@@ -37,8 +37,20 @@ class Settings(BaseSettings):
     # Runtime Settings
     packages_dir: str = "/packages"
     
+    # Workspace Settings
+    workspace_dir: Optional[str] = None  # Parent of job workspaces; point at a tmpfs mount (system temp dir if unset)
+    workspace_pool_size: int = 32  # Workspace directories kept for reuse
+    
+    # Result Cache (reuses results of identical offline submissions; 0 disables it)
+    result_cache_size: int = 0
+    
+    # Warm Workers (long-running Python interpreters per runtime; 0 disables them)
+    warm_pool_size: int = 0
+    
     # Sandbox Settings
     use_bubblewrap: bool = True  # Set to False to force direct mode (less secure)
+    cgroup_root: Optional[str] = None  # Delegated cgroup v2 directory for per-job memory/pids limits
+    cgroup_pids_max: int = 64  # Maximum processes per job when cgroup_root is set
     
     # Logging
     log_level: str = "INFO"
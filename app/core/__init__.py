@@ -2,7 +2,19 @@
 Core business logic modules.
 """
 from .executor import CodeExecutor
-from .runtime import RuntimeManager
-from .sandbox import SandboxManager
+from .runtime import RuntimeManager, runtime_manager
+from .sandbox import SandboxManager, sandbox_manager
+from .workspace_pool import WorkspacePool
+from .result_cache import ResultCache
+from .warm_pool import WarmWorkerPool
 
-__all__ = ["CodeExecutor", "RuntimeManager", "SandboxManager"]
+__all__ = [
+    "CodeExecutor",
+    "RuntimeManager",
+    "SandboxManager",
+    "WorkspacePool",
+    "ResultCache",
+    "WarmWorkerPool",
+    "runtime_manager",
+    "sandbox_manager",
+]
@@ -3,19 +3,24 @@ Code execution engine core.
 """
 import os
 import time
-import uuid
-import tempfile
+import asyncio
+import select
+import selectors
+import itertools
 import subprocess
 import resource
-from typing import Tuple
+from functools import lru_cache
+from typing import List, Optional, Tuple
 import logging
 
 from app.models import ExecRequest, ExecResult, RunResult
-from app.core.runtime import RuntimeManager
-from app.core.sandbox import SandboxManager
+from app.core.runtime import runtime_manager
+from app.core.sandbox import sandbox_manager
+from app.core.workspace_pool import WorkspacePool
+from app.core.result_cache import ResultCache
+from app.core.warm_pool import WarmWorkerPool
 from app.config import settings
 from app.exceptions import (
-    CodeEngineException,
     RuntimeNotFoundException,
     UnsupportedLanguageException,
     SandboxExecutionException,
@@ -24,39 +29,59 @@ from app.exceptions import (
 
 logger = logging.getLogger(__name__)
 
+# Bytes requested per read() from the child's stdout/stderr pipes
+_READ_CHUNK_SIZE = 64 * 1024
+
+
+@lru_cache(maxsize=None)
+def _truncation_warning(label: str, max_size: int) -> Tuple[str, int]:
+    """Return the truncation notice for a stream and its size in bytes."""
+    warning = f"\n\n[TRUNCATED: {label} exceeded {max_size} bytes ({max_size // 1024} KB)]\n"
+    return warning, len(warning.encode('utf-8'))
+
 
 class CodeExecutor:
     """Handles code execution in a sandboxed environment."""
 
     def __init__(self):
-        self.runtime_manager = RuntimeManager()
-        self.sandbox_manager = SandboxManager()
+        self.runtime_manager = runtime_manager
+        self.sandbox_manager = sandbox_manager
+        self._job_counter = itertools.count(1)
+        self.result_cache = ResultCache(settings.result_cache_size)
+        self.workspace_pool = WorkspacePool(
+            settings.workspace_pool_size,
+            root=settings.workspace_dir
+        )
+        self.warm_pool = WarmWorkerPool(settings.warm_pool_size)
+
+    def _next_job_id(self) -> str:
+        """
+        Generate a job identifier for log correlation.
+        
+        Returns:
+            "<pid>-<counter>", unique across worker processes of one server
+        """
+        return f"{os.getpid()}-{next(self._job_counter)}"
 
     @staticmethod
-    def truncate_output(output: str, max_size: int, label: str = "output") -> str:
+    def truncate_output(output: bytes, max_size: int, label: str = "output") -> str:
         """
-        Truncate output if it exceeds the maximum size.
+        Decode process output, truncating it if it exceeds the maximum size.
         
         Args:
-            output: Output string to truncate
+            output: Raw output bytes (may already be capped at max_size + 1)
             max_size: Maximum size in bytes
             label: Label for the truncation message (stdout/stderr)
             
         Returns:
-            Truncated output with warning message if needed
+            Decoded output with warning message if it was truncated
         """
-        output_bytes = output.encode('utf-8')
-        if len(output_bytes) <= max_size:
-            return output
+        if len(output) <= max_size:
+            return output.decode('utf-8', errors='ignore')
         
-        # Truncate and add warning
-        truncated = output_bytes[:max_size].decode('utf-8', errors='ignore')
-        warning = f"\n\n[TRUNCATED: {label} exceeded {max_size} bytes ({max_size // 1024} KB)]\n"
-        
-        # Make room for the warning message
-        warning_size = len(warning.encode('utf-8'))
-        if len(output_bytes) > max_size - warning_size:
-            truncated = output_bytes[:max_size - warning_size].decode('utf-8', errors='ignore')
+        # Truncate and make room for the warning message
+        warning, warning_size = _truncation_warning(label, max_size)
+        truncated = output[:max_size - warning_size].decode('utf-8', errors='ignore')
         
         return truncated + warning
 
@@ -71,20 +96,30 @@ class CodeExecutor:
         Raises:
             FileSystemException: If file writing fails
         """
+        created_dirs = set()
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
         try:
             for file in files:
                 file_path = os.path.join(workdir, file.name)
                 
-                # Create parent directories if needed
-                parent_dir = os.path.dirname(file_path)
-                if parent_dir:
-                    os.makedirs(parent_dir, exist_ok=True)
+                # Create parent directories if needed (most files sit at the root)
+                if '/' in file.name:
+                    parent_dir = os.path.dirname(file_path)
+                    if parent_dir not in created_dirs:
+                        os.makedirs(parent_dir, exist_ok=True)
+                        created_dirs.add(parent_dir)
                 
-                # Write file content
-                with open(file_path, 'w', encoding='utf-8') as fp:
-                    fp.write(file.content)
+                # Write file content with a single unbuffered write
+                data = memoryview(file.content.encode('utf-8'))
+                fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                try:
+                    while data:
+                        data = data[os.write(fd, data):]
+                finally:
+                    os.close(fd)
                     
-                logger.debug(f"Created file: {file_path}")
+                if debug_enabled:
+                    logger.debug("Created file: %s", file_path)
                 
         except (OSError, IOError) as e:
             raise FileSystemException(f"Failed to prepare workspace: {str(e)}")
@@ -93,13 +128,16 @@ class CodeExecutor:
         """
         Execute code in a sandboxed environment.
         
+        Blocks until the process exits; see execute_code_async for use
+        from the event loop.
+        
         Args:
             request: ExecRequest containing all execution parameters
             
         Returns:
             ExecResult with execution output and metadata
         """
-        job_id = str(uuid.uuid4())
+        job_id = self._next_job_id()
         start_time = time.time()
         cpu_start = time.process_time()
 
@@ -111,169 +149,416 @@ class CodeExecutor:
                     request.version
                 )
             except (RuntimeNotFoundException, UnsupportedLanguageException) as e:
-                logger.error(f"Runtime error for job {job_id}: {str(e)}")
-                return ExecResult(
-                    language=request.language,
-                    version=request.version,
-                    run=RunResult(
-                        stdout="",
-                        stderr="",
-                        output="",
-                        code=127,
-                        signal=None,
-                        message=str(e),
-                        status="error",
-                        cpu_time=0,
-                        wall_time=0,
-                        memory=None
-                    )
-                )
+                logger.error("Runtime error for job %s: %s", job_id, e)
+                return self._error_result(request, code=127, message=str(e))
 
-            # Create temporary workspace
-            with tempfile.TemporaryDirectory() as workdir:
-                try:
-                    # Prepare files in workspace
-                    self.prepare_workspace(request.files, workdir)
-                    
-                    # Build command to execute
-                    # First file is the main file to execute
-                    main_file = request.files[0].name
-                    
-                    # Check if bubblewrap is working
-                    use_bwrap = self.sandbox_manager.check_bubblewrap_working()
-                    
-                    # Adjust runtime command path for sandbox
-                    if use_bwrap and settings.packages_dir.startswith('/app/'):
-                        # Replace /app/packages with /packages in runtime command
-                        adjusted_runtime_cmd = [
-                            cmd.replace(settings.packages_dir, '/packages') 
-                            for cmd in runtime_cmd
-                        ]
-                    else:
-                        adjusted_runtime_cmd = runtime_cmd
-                    
-                    cmd_inside = adjusted_runtime_cmd + [main_file] + (request.args or [])
-                    
-                    if use_bwrap:
-                        # Build sandboxed command with bubblewrap
-                        full_cmd = self.sandbox_manager.build_bubblewrap_command(
-                            workdir=workdir,
-                            runtime_cmd=cmd_inside,
-                            internet_enabled=request.internet
+            # Identical offline submissions can reuse an earlier result
+            cache_key = self.result_cache.key_for(request, runtime_cmd)
+            if cache_key is not None:
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    logger.info("Job %s served from result cache", job_id)
+                    return cached
+
+            # Encode stdin up front, before the child process is started
+            stdin_data = request.stdin.encode('utf-8')
+
+            try:
+                # Prefer a warm interpreter when one is free
+                result_data = None
+                if self.warm_pool.supports(request):
+                    result_data = self._run_warm(request, runtime_cmd, stdin_data, job_id)
+
+                if result_data is None:
+                    # Borrow an empty workspace from the pool
+                    with self.workspace_pool.acquire() as workdir:
+                        # Prepare files in workspace
+                        self.prepare_workspace(request.files, workdir)
+                        
+                        full_cmd, use_bwrap = self._build_command(
+                            request, runtime_cmd, workdir, job_id
                         )
-                        logger.info(f"Executing job {job_id}: {request.language} {request.version} (sandboxed)")
-                    else:
-                        # Fallback: direct execution without bubblewrap
-                        full_cmd = self.sandbox_manager.build_direct_command(
+                        
+                        # Execute with resource limits
+                        result_data = self._run_sandboxed_process(
+                            full_cmd,
                             workdir=workdir,
-                            runtime_cmd=cmd_inside
+                            stdin_data=stdin_data,
+                            memory_limit=request.memory_limit,
+                            time_limit=request.time_limit,
+                            use_bwrap=use_bwrap
                         )
-                        logger.warning(f"Executing job {job_id}: {request.language} {request.version} (direct mode - bubblewrap unavailable)")
                     
-                    # Execute with resource limits
-                    result_data = self._run_sandboxed_process(
-                        full_cmd,
-                        workdir=workdir,
-                        stdin_data=request.stdin,
-                        memory_limit=request.memory_limit,
-                        time_limit=request.time_limit,
-                        use_bwrap=use_bwrap
+            except FileSystemException as e:
+                logger.error("Filesystem error for job %s: %s", job_id, e)
+                return self._error_result(request, code=1, message=str(e))
+            except SandboxExecutionException as e:
+                logger.error("Sandbox error for job %s: %s", job_id, e)
+                return self._error_result(request, code=1, message=str(e), stderr=str(e))
+
+            result = self._build_result(request, job_id, result_data, start_time, cpu_start)
+            if cache_key is not None:
+                self.result_cache.put(cache_key, result)
+            return result
+
+        except Exception as e:
+            # Catch-all for unexpected errors
+            logger.exception("Unexpected error for job %s", job_id)
+            wall_time_ms = int((time.time() - start_time) * 1000)
+            return self._error_result(
+                request, code=1, message=f"Internal error: {str(e)}", wall_time=wall_time_ms
+            )
+
+    async def execute_code_async(self, request: ExecRequest) -> ExecResult:
+        """
+        Execute code in a sandboxed environment without blocking the event loop.
+        
+        Mirrors execute_code, but supervises the child process with asyncio
+        so one worker can run many jobs concurrently.
+        
+        Args:
+            request: ExecRequest containing all execution parameters
+            
+        Returns:
+            ExecResult with execution output and metadata
+        """
+        job_id = self._next_job_id()
+        start_time = time.time()
+        cpu_start = time.process_time()
+
+        try:
+            # Get runtime command
+            try:
+                runtime_cmd = self.runtime_manager.get_cached_runtime_command(
+                    request.language,
+                    request.version
+                )
+                if runtime_cmd is None:
+                    # A cache miss rescans the runtime directories
+                    runtime_cmd = await asyncio.to_thread(
+                        self.runtime_manager.get_runtime_command,
+                        request.language,
+                        request.version
                     )
-                    
-                except FileSystemException as e:
-                    logger.error(f"Filesystem error for job {job_id}: {str(e)}")
-                    return ExecResult(
-                        language=request.language,
-                        version=request.version,
-                        run=RunResult(
-                            stdout="",
-                            stderr="",
-                            output="",
-                            code=1,
-                            signal=None,
-                            message=str(e),
-                            status="error",
-                            cpu_time=0,
-                            wall_time=0,
-                            memory=None
-                        )
+            except (RuntimeNotFoundException, UnsupportedLanguageException) as e:
+                logger.error("Runtime error for job %s: %s", job_id, e)
+                return self._error_result(request, code=127, message=str(e))
+
+            # Identical offline submissions can reuse an earlier result
+            cache_key = self.result_cache.key_for(request, runtime_cmd)
+            if cache_key is not None:
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    logger.info("Job %s served from result cache", job_id)
+                    return cached
+
+            # Encode stdin up front, before the child process is started
+            stdin_data = request.stdin.encode('utf-8')
+
+            try:
+                # Prefer a warm interpreter when one is free
+                result_data = None
+                if self.warm_pool.supports(request):
+                    result_data = await self._run_warm_async(
+                        request, runtime_cmd, stdin_data, job_id
                     )
-                except SandboxExecutionException as e:
-                    logger.error(f"Sandbox error for job {job_id}: {str(e)}")
-                    return ExecResult(
-                        language=request.language,
-                        version=request.version,
-                        run=RunResult(
-                            stdout="",
-                            stderr=str(e),
-                            output=str(e),
-                            code=1,
-                            signal=None,
-                            message=str(e),
-                            status="error",
-                            cpu_time=0,
-                            wall_time=0,
-                            memory=None
+
+                if result_data is None:
+                    # Borrow an empty workspace from the pool
+                    async with self.workspace_pool.acquire_async() as workdir:
+                        # Write the files off the event loop
+                        full_cmd, use_bwrap = await asyncio.to_thread(
+                            self._prepare_job, request, runtime_cmd, workdir, job_id
                         )
-                    )
+                        
+                        # Execute with resource limits
+                        result_data = await self._run_sandboxed_process_async(
+                            full_cmd,
+                            workdir=workdir,
+                            stdin_data=stdin_data,
+                            memory_limit=request.memory_limit,
+                            time_limit=request.time_limit,
+                            use_bwrap=use_bwrap
+                        )
+                    
+            except FileSystemException as e:
+                logger.error("Filesystem error for job %s: %s", job_id, e)
+                return self._error_result(request, code=1, message=str(e))
+            except SandboxExecutionException as e:
+                logger.error("Sandbox error for job %s: %s", job_id, e)
+                return self._error_result(request, code=1, message=str(e), stderr=str(e))
+
+            result = self._build_result(request, job_id, result_data, start_time, cpu_start)
+            if cache_key is not None:
+                self.result_cache.put(cache_key, result)
+            return result
 
-            # Calculate execution time
+        except Exception as e:
+            # Catch-all for unexpected errors
+            logger.exception("Unexpected error for job %s", job_id)
             wall_time_ms = int((time.time() - start_time) * 1000)
-            cpu_time_ms = int((time.process_time() - cpu_start) * 1000)
+            return self._error_result(
+                request, code=1, message=f"Internal error: {str(e)}", wall_time=wall_time_ms
+            )
+
+    def _run_warm(
+        self,
+        request: ExecRequest,
+        runtime_cmd: List[str],
+        stdin_data: bytes,
+        job_id: str
+    ) -> Optional[dict]:
+        """
+        Run a job on a warm worker from the pool.
+        
+        Args:
+            request: ExecRequest being executed
+            runtime_cmd: Runtime binary command from RuntimeManager
+            stdin_data: UTF-8 encoded input for stdin
+            job_id: Job identifier used in log messages
+            
+        Returns:
+            Result dictionary as from _run_sandboxed_process, or None if no
+            worker is free and the job should take the cold path
             
-            # Truncate output if needed
-            stdout = self.truncate_output(result_data['stdout'], settings.max_output_size, "stdout")
-            stderr = self.truncate_output(result_data['stderr'], settings.max_stderr_size, "stderr")
+        Raises:
+            FileSystemException: If file writing fails
+            SandboxExecutionException: If the worker fails
+        """
+        with self.warm_pool.acquire(runtime_cmd, request.internet) as worker:
+            if worker is None:
+                return None
             
-            # Combine stdout and stderr for output field
-            output = stdout if not stderr else (stdout + stderr if stdout else stderr)
+            self.prepare_workspace(request.files, worker.workdir)
+            logger.info(
+                "Executing job %s: %s %s (warm worker)",
+                job_id, request.language, request.version
+            )
+            return worker.run(
+                request.files[0].name,
+                request.args or [],
+                stdin_data,
+                memory_limit=request.memory_limit,
+                time_limit=request.time_limit
+            )
+
+    async def _run_warm_async(
+        self,
+        request: ExecRequest,
+        runtime_cmd: List[str],
+        stdin_data: bytes,
+        job_id: str
+    ) -> Optional[dict]:
+        """
+        Asyncio counterpart of _run_warm.
+        
+        The job is supervised by the event loop, so it holds no thread
+        while it runs.
+        
+        Returns:
+            Result dictionary as from _run_sandboxed_process, or None if no
+            worker is free and the job should take the cold path
             
-            logger.info(f"Job {job_id} completed with exit code {result_data['exit_code']} in {wall_time_ms}ms")
+        Raises:
+            FileSystemException: If file writing fails
+            SandboxExecutionException: If the worker fails
+        """
+        async with self.warm_pool.acquire_async(runtime_cmd, request.internet) as worker:
+            if worker is None:
+                return None
             
-            return ExecResult(
-                language=request.language,
-                version=request.version,
-                run=RunResult(
-                    stdout=stdout,
-                    stderr=stderr,
-                    output=output,
-                    code=result_data['exit_code'],
-                    signal=result_data.get('signal'),
-                    message=None,
-                    status=None,
-                    cpu_time=cpu_time_ms,
-                    wall_time=wall_time_ms,
-                    memory=result_data.get('memory')
-                )
+            await asyncio.to_thread(self.prepare_workspace, request.files, worker.workdir)
+            logger.info(
+                "Executing job %s: %s %s (warm worker)",
+                job_id, request.language, request.version
+            )
+            return await worker.run_async(
+                request.files[0].name,
+                request.args or [],
+                stdin_data,
+                memory_limit=request.memory_limit,
+                time_limit=request.time_limit
             )
 
-        except Exception as e:
-            # Catch-all for unexpected errors
-            logger.exception(f"Unexpected error for job {job_id}")
-            wall_time_ms = int((time.time() - start_time) * 1000)
+    def _prepare_job(
+        self,
+        request: ExecRequest,
+        runtime_cmd: List[str],
+        workdir: str,
+        job_id: str
+    ) -> Tuple[List[str], bool]:
+        """
+        Write the job's files into its workspace and build its command line.
+        
+        Returns:
+            Tuple of (command list, whether bubblewrap is used)
             
-            return ExecResult(
-                language=request.language,
-                version=request.version,
-                run=RunResult(
-                    stdout="",
-                    stderr="",
-                    output="",
-                    code=1,
-                    signal=None,
-                    message=f"Internal error: {str(e)}",
-                    status="error",
-                    cpu_time=0,
-                    wall_time=wall_time_ms,
-                    memory=None
-                )
+        Raises:
+            FileSystemException: If the workspace cannot be prepared
+        """
+        self.prepare_workspace(request.files, workdir)
+        return self._build_command(request, runtime_cmd, workdir, job_id)
+
+    def _build_command(
+        self,
+        request: ExecRequest,
+        runtime_cmd: List[str],
+        workdir: str,
+        job_id: str
+    ) -> Tuple[List[str], bool]:
+        """
+        Build the full command line for a job.
+        
+        Args:
+            request: ExecRequest being executed
+            runtime_cmd: Runtime binary command from RuntimeManager
+            workdir: Prepared workspace directory
+            job_id: Job identifier used in log messages
+            
+        Returns:
+            Tuple of (command list, whether bubblewrap is used)
+        """
+        # First file is the main file to execute
+        main_file = request.files[0].name
+        
+        # Check if bubblewrap is working
+        use_bwrap = self.sandbox_manager.check_bubblewrap_working()
+        
+        # Adjust runtime command path for sandbox
+        if use_bwrap:
+            adjusted_runtime_cmd = self.sandbox_manager.adjust_runtime_command(runtime_cmd)
+        else:
+            adjusted_runtime_cmd = runtime_cmd
+        
+        cmd_inside = adjusted_runtime_cmd + [main_file] + (request.args or [])
+        
+        if use_bwrap:
+            # Build sandboxed command with bubblewrap
+            full_cmd = self.sandbox_manager.build_bubblewrap_command(
+                workdir=workdir,
+                runtime_cmd=cmd_inside,
+                internet_enabled=request.internet
+            )
+            logger.info(
+                "Executing job %s: %s %s (sandboxed)",
+                job_id, request.language, request.version
+            )
+        else:
+            # Fallback: direct execution without bubblewrap
+            full_cmd = self.sandbox_manager.build_direct_command(
+                workdir=workdir,
+                runtime_cmd=cmd_inside
+            )
+            logger.warning(
+                "Executing job %s: %s %s (direct mode - bubblewrap unavailable)",
+                job_id, request.language, request.version
+            )
+        
+        return full_cmd, use_bwrap
+
+    def _build_result(
+        self,
+        request: ExecRequest,
+        job_id: str,
+        result_data: dict,
+        start_time: float,
+        cpu_start: float
+    ) -> ExecResult:
+        """
+        Build the ExecResult for a job whose process ran to completion or timeout.
+        
+        Args:
+            request: ExecRequest that was executed
+            job_id: Job identifier used in log messages
+            result_data: Dictionary returned by the process runner
+            start_time: time.time() at job start
+            cpu_start: time.process_time() at job start
+            
+        Returns:
+            ExecResult with decoded, truncated output and timings
+        """
+        # Calculate execution time
+        wall_time_ms = int((time.time() - start_time) * 1000)
+        cpu_time_ms = int((time.process_time() - cpu_start) * 1000)
+        
+        # Truncate output if needed
+        stdout = self.truncate_output(result_data['stdout'], settings.max_output_size, "stdout")
+        stderr = self.truncate_output(result_data['stderr'], settings.max_stderr_size, "stderr")
+        
+        # Combine stdout and stderr for output field, only copying when both are set
+        if not stderr:
+            output = stdout
+        elif not stdout:
+            output = stderr
+        else:
+            output = "".join((stdout, stderr))
+        
+        logger.info(
+            "Job %s completed with exit code %s in %sms",
+            job_id, result_data['exit_code'], wall_time_ms
+        )
+        
+        # Every value is produced here, so skip validation on construction
+        return ExecResult.model_construct(
+            language=request.language,
+            version=request.version,
+            run=RunResult.model_construct(
+                stdout=stdout,
+                stderr=stderr,
+                output=output,
+                code=result_data['exit_code'],
+                signal=result_data.get('signal'),
+                message=None,
+                status=None,
+                cpu_time=cpu_time_ms,
+                wall_time=wall_time_ms,
+                memory=result_data.get('memory')
+            )
+        )
+
+    @staticmethod
+    def _error_result(
+        request: ExecRequest,
+        code: int,
+        message: str,
+        stderr: str = "",
+        wall_time: int = 0
+    ) -> ExecResult:
+        """
+        Build the ExecResult for a job that failed before producing output.
+        
+        Args:
+            request: ExecRequest that failed
+            code: Exit code to report
+            message: Error message
+            stderr: Text reported as stderr and output
+            wall_time: Wall time in milliseconds
+            
+        Returns:
+            ExecResult with status "error"
+        """
+        return ExecResult.model_construct(
+            language=request.language,
+            version=request.version,
+            run=RunResult.model_construct(
+                stdout="",
+                stderr=stderr,
+                output=stderr,
+                code=code,
+                signal=None,
+                message=message,
+                status="error",
+                cpu_time=0,
+                wall_time=wall_time,
+                memory=None
             )
+        )
 
     def _run_sandboxed_process(
         self,
         command: list,
         workdir: str,
-        stdin_data: str,
+        stdin_data: bytes,
         memory_limit: int,
         time_limit: float,
         use_bwrap: bool = True
@@ -284,7 +569,7 @@ class CodeExecutor:
         Args:
             command: Command list to execute
             workdir: Working directory for the process
-            stdin_data: Input data for stdin
+            stdin_data: UTF-8 encoded input for stdin
             memory_limit: Memory limit in MB
             time_limit: Time limit in seconds
             use_bwrap: Whether bubblewrap is being used
@@ -295,11 +580,16 @@ class CodeExecutor:
         Raises:
             SandboxExecutionException: If execution fails
         """
+        # Kernel-enforced memory and process limits, when configured
+        cgroup_dir = self.sandbox_manager.create_job_cgroup(memory_limit)
+        cgroup_peak = None
         try:
-            # Create resource limiter
-            limiter = self.sandbox_manager.create_resource_limiter(
+            # Attach resource limits
+            command, limiter = self.sandbox_manager.apply_resource_limits(
+                command,
                 memory_limit, 
-                time_limit
+                time_limit,
+                cgroup_dir=cgroup_dir
             )
             
             # Prepare process arguments
@@ -307,7 +597,6 @@ class CodeExecutor:
                 "stdin": subprocess.PIPE,
                 "stdout": subprocess.PIPE,
                 "stderr": subprocess.PIPE,
-                "text": True,
                 "preexec_fn": limiter
             }
             
@@ -318,31 +607,61 @@ class CodeExecutor:
             # Start process
             proc = subprocess.Popen(command, **process_args)
             
-            # Communicate with timeout
+            # Feed stdin and collect output until exit or timeout
             signal_name = None
-            try:
-                stdout, stderr = proc.communicate(
-                    input=stdin_data,
-                    timeout=time_limit + 0.5  # Add margin for cleanup
-                )
-                exit_code = proc.returncode
-                
-                # Check if process was terminated by signal
-                if exit_code < 0:
-                    signal_name = f"signal_{abs(exit_code)}"
+            stdout = bytearray()
+            stderr = bytearray()
+            limits = {
+                proc.stdout: (stdout, settings.max_output_size + 1),
+                proc.stderr: (stderr, settings.max_stderr_size + 1)
+            }
+            with selectors.DefaultSelector() as selector:
+                if stdin_data:
+                    selector.register(proc.stdin, selectors.EVENT_WRITE)
+                else:
+                    proc.stdin.close()
+                selector.register(proc.stdout, selectors.EVENT_READ)
+                selector.register(proc.stderr, selectors.EVENT_READ)
                 
-            except subprocess.TimeoutExpired:
-                # Kill process on timeout
-                proc.kill()
-                try:
-                    stdout, stderr = proc.communicate(timeout=1)
-                except subprocess.TimeoutExpired:
-                    stdout, stderr = "", ""
+                deadline = time.monotonic() + time_limit + 0.5  # Add margin for cleanup
+                finished = self._pump_pipes(proc, selector, stdin_data, limits, deadline)
+                if finished:
+                    try:
+                        proc.wait(timeout=max(deadline - time.monotonic(), 0))
+                    except subprocess.TimeoutExpired:
+                        finished = False
                 
-                stderr = "TIMEOUT: Execution exceeded time limit\n" + stderr
-                exit_code = 124  # Standard timeout exit code
-                signal_name = "SIGKILL"
+                if finished:
+                    exit_code = proc.returncode
+                    
+                    # Check if process was terminated by signal
+                    if exit_code < 0:
+                        signal_name = f"signal_{abs(exit_code)}"
+                else:
+                    # Kill process on timeout, keeping what it wrote so far
+                    proc.kill()
+                    self._pump_pipes(proc, selector, b"", limits, time.monotonic() + 1)
+                    proc.wait()
+                    
+                    stderr[:0] = b"TIMEOUT: Execution exceeded time limit\n"
+                    exit_code = 124  # Standard timeout exit code
+                    signal_name = "SIGKILL"
             
+        except OSError as e:
+            raise SandboxExecutionException(
+                f"Failed to execute sandboxed process: {str(e)}"
+            )
+        except Exception as e:
+            raise SandboxExecutionException(
+                f"Unexpected error during execution: {str(e)}"
+            )
+        finally:
+            if cgroup_dir is not None:
+                cgroup_peak = self.sandbox_manager.remove_job_cgroup(cgroup_dir)
+        
+        if cgroup_peak is not None:
+            memory_bytes = cgroup_peak
+        else:
             # Try to get memory usage (rough estimate)
             try:
                 rusage = resource.getrusage(resource.RUSAGE_CHILDREN)
@@ -350,7 +669,175 @@ class CodeExecutor:
                 memory_bytes = rusage.ru_maxrss * 1024
             except:
                 memory_bytes = None
+
+        return {
+            'stdout': bytes(stdout),
+            'stderr': bytes(stderr),
+            'exit_code': exit_code,
+            'signal': signal_name,
+            'memory': memory_bytes
+        }
+
+    @staticmethod
+    def _pump_pipes(
+        proc: subprocess.Popen,
+        selector: selectors.BaseSelector,
+        stdin_bytes: bytes,
+        limits: dict,
+        deadline: float
+    ) -> bool:
+        """
+        Write stdin and read stdout/stderr until all pipes are closed.
+        
+        Output beyond each buffer's limit is read and discarded so the child
+        never blocks on a full pipe, but memory stays bounded.
+        
+        Args:
+            proc: Running process with piped stdin/stdout/stderr
+            selector: Selector with the still-open pipes registered
+            stdin_bytes: Data to feed to stdin
+            limits: Maps stdout/stderr pipes to (buffer, max bytes kept)
+            deadline: time.monotonic() value at which to give up
+            
+        Returns:
+            True if every pipe was closed, False if the deadline passed first
+        """
+        stdin_view = memoryview(stdin_bytes)
+        stdin_offset = 0
+        
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            
+            for key, _ in selector.select(remaining):
+                pipe = key.fileobj
+                if pipe is proc.stdin:
+                    try:
+                        stdin_offset += os.write(
+                            pipe.fileno(),
+                            stdin_view[stdin_offset:stdin_offset + select.PIPE_BUF]
+                        )
+                    except BrokenPipeError:
+                        # The process does not read its input; drop the rest
+                        stdin_offset = len(stdin_view)
+                    if stdin_offset >= len(stdin_view):
+                        selector.unregister(pipe)
+                        try:
+                            pipe.close()
+                        except BrokenPipeError:
+                            pass
+                    continue
                 
+                chunk = os.read(pipe.fileno(), _READ_CHUNK_SIZE)
+                if not chunk:
+                    selector.unregister(pipe)
+                    pipe.close()
+                    continue
+                
+                buffer, limit = limits[pipe]
+                room = limit - len(buffer)
+                if room > 0:
+                    buffer += chunk[:room]
+        
+        return True
+
+    async def _run_sandboxed_process_async(
+        self,
+        command: list,
+        workdir: str,
+        stdin_data: bytes,
+        memory_limit: int,
+        time_limit: float,
+        use_bwrap: bool = True
+    ) -> dict:
+        """
+        Asyncio counterpart of _run_sandboxed_process.
+        
+        Args:
+            command: Command list to execute
+            workdir: Working directory for the process
+            stdin_data: UTF-8 encoded input for stdin
+            memory_limit: Memory limit in MB
+            time_limit: Time limit in seconds
+            use_bwrap: Whether bubblewrap is being used
+            
+        Returns:
+            Dictionary with stdout, stderr, exit_code, signal, memory
+            
+        Raises:
+            SandboxExecutionException: If execution fails
+        """
+        # Kernel-enforced memory and process limits, when configured
+        cgroup_dir = None
+        if settings.cgroup_root:
+            cgroup_dir = await asyncio.to_thread(
+                self.sandbox_manager.create_job_cgroup, memory_limit
+            )
+        cgroup_peak = None
+        try:
+            # Attach resource limits
+            command, limiter = self.sandbox_manager.apply_resource_limits(
+                command,
+                memory_limit, 
+                time_limit,
+                cgroup_dir=cgroup_dir
+            )
+            
+            # Start process (cwd only matters without bubblewrap)
+            proc = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                preexec_fn=limiter,
+                cwd=None if use_bwrap else workdir
+            )
+            
+            # Feed stdin and collect output until exit or timeout
+            signal_name = None
+            stdout = bytearray()
+            stderr = bytearray()
+            tasks = [
+                asyncio.ensure_future(self._feed_stdin(proc.stdin, stdin_data)),
+                asyncio.ensure_future(
+                    self._read_bounded(proc.stdout, stdout, settings.max_output_size + 1)
+                ),
+                asyncio.ensure_future(
+                    self._read_bounded(proc.stderr, stderr, settings.max_stderr_size + 1)
+                ),
+                asyncio.ensure_future(proc.wait())
+            ]
+            _, pending = await asyncio.wait(tasks, timeout=time_limit + 0.5)  # Add margin for cleanup
+            
+            if not pending:
+                exit_code = proc.returncode
+                
+                # Check if process was terminated by signal
+                if exit_code < 0:
+                    signal_name = f"signal_{abs(exit_code)}"
+            else:
+                # Kill process on timeout, keeping what it wrote so far
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    pass  # Already exited; a descendant holds the pipes open
+                _, pending = await asyncio.wait(pending, timeout=1)
+                for task in pending:
+                    task.cancel()
+                # Let the cancellations finish before the results are inspected
+                await asyncio.gather(*pending, return_exceptions=True)
+                await proc.wait()
+                
+                stderr[:0] = b"TIMEOUT: Execution exceeded time limit\n"
+                exit_code = 124  # Standard timeout exit code
+                signal_name = "SIGKILL"
+            
+            # Surface unexpected errors from the pipe tasks
+            for task in tasks:
+                if task.done() and not task.cancelled():
+                    task.result()
+            
         except OSError as e:
             raise SandboxExecutionException(
                 f"Failed to execute sandboxed process: {str(e)}"
@@ -359,11 +846,50 @@ class CodeExecutor:
             raise SandboxExecutionException(
                 f"Unexpected error during execution: {str(e)}"
             )
+        finally:
+            if cgroup_dir is not None:
+                cgroup_peak = await asyncio.to_thread(
+                    self.sandbox_manager.remove_job_cgroup, cgroup_dir
+                )
+        
+        if cgroup_peak is not None:
+            memory_bytes = cgroup_peak
+        else:
+            # Try to get memory usage (rough estimate)
+            try:
+                rusage = resource.getrusage(resource.RUSAGE_CHILDREN)
+                # maxrss is in KB on Linux, convert to bytes
+                memory_bytes = rusage.ru_maxrss * 1024
+            except:
+                memory_bytes = None
 
         return {
-            'stdout': stdout,
-            'stderr': stderr,
+            'stdout': bytes(stdout),
+            'stderr': bytes(stderr),
             'exit_code': exit_code,
             'signal': signal_name,
             'memory': memory_bytes
         }
+
+    @staticmethod
+    async def _feed_stdin(stream: asyncio.StreamWriter, data: bytes) -> None:
+        """Write stdin data and close the pipe, ignoring processes that exit early."""
+        try:
+            if data:
+                stream.write(data)
+                await stream.drain()
+            stream.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # The process does not read its input; drop the rest
+            pass
+
+    @staticmethod
+    async def _read_bounded(stream: asyncio.StreamReader, buffer: bytearray, limit: int) -> None:
+        """Read a pipe to EOF, keeping at most limit bytes in buffer."""
+        while True:
+            chunk = await stream.read(_READ_CHUNK_SIZE)
+            if not chunk:
+                return
+            room = limit - len(buffer)
+            if room > 0:
+                buffer += chunk[:room]
@@ -0,0 +1,109 @@
+"""
+Cache of execution results for identical submissions.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from app.models import ExecRequest, ExecResult
+
+# Results with more combined output than this are not worth the memory
+_MAX_CACHED_OUTPUT = 64 * 1024
+
+
+class ResultCache:
+    """Bounded LRU cache mapping a request fingerprint to its ExecResult."""
+
+    def __init__(self, maxsize: int):
+        """
+        Create the cache.
+
+        Args:
+            maxsize: Maximum number of cached results (0 disables caching)
+        """
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, ExecResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key_for(self, request: ExecRequest, runtime_cmd: List[str]) -> Optional[bytes]:
+        """
+        Fingerprint everything in a request that can affect its result.
+
+        The resolved runtime is part of the key, so installing a newer
+        version that a partial version now matches never serves stale results.
+
+        Args:
+            request: ExecRequest to fingerprint
+            runtime_cmd: Runtime command the request resolved to
+
+        Returns:
+            Digest of the request, or None if it must not be cached
+            (caching disabled, or the program may talk to the network)
+        """
+        if self.maxsize <= 0 or request.internet:
+            return None
+
+        digest = hashlib.blake2b(digest_size=32)
+        parts = [
+            request.language,
+            request.version,
+            str(len(runtime_cmd)),
+            *runtime_cmd,
+            repr(request.time_limit),
+            str(request.memory_limit),
+            request.stdin,
+            str(len(request.args)),
+            *request.args,
+            str(len(request.files))
+        ]
+        for part in parts:
+            data = part.encode('utf-8')
+            # Length-prefix every part so different splits never collide
+            digest.update(len(data).to_bytes(8, 'little'))
+            digest.update(data)
+        for file in request.files:
+            for part in (file.name, file.content):
+                data = part.encode('utf-8')
+                digest.update(len(data).to_bytes(8, 'little'))
+                digest.update(data)
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[ExecResult]:
+        """
+        Look up a cached result.
+
+        Args:
+            key: Fingerprint from key_for()
+
+        Returns:
+            The cached ExecResult, or None on a miss
+        """
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            return result
+
+    def put(self, key: bytes, result: ExecResult) -> None:
+        """
+        Store a result if it reflects a normal run of the program.
+
+        Errors, timeouts and signal deaths depend on server state and load,
+        so they are never cached; neither are results with large output.
+
+        Args:
+            key: Fingerprint from key_for()
+            result: ExecResult of the request
+        """
+        run = result.run
+        if run.status is not None or run.signal is not None:
+            return
+        if len(run.output) > _MAX_CACHED_OUTPUT:
+            return
+
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
@@ -2,10 +2,32 @@
 Runtime management for different programming languages.
 """
 import os
-from typing import List
+import stat
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 from app.exceptions import RuntimeNotFoundException, UnsupportedLanguageException
 from app.config import settings
 
+
+@lru_cache(maxsize=256)
+def _version_key(version: str) -> Tuple[Tuple[int, bool, str], ...]:
+    """
+    Sort key that orders version strings numerically ("3.9.1" < "3.10.0").
+    
+    Each dot-separated part compares by its leading number, then a release
+    sorts after its pre-releases ("3.13.0rc1" < "3.13.0").
+    """
+    key = []
+    for part in version.split('.'):
+        digits = len(part) - len(part.lstrip('0123456789'))
+        number = int(part[:digits]) if digits else -1
+        suffix = part[digits:]
+        key.append((number, suffix == '', suffix))
+    return tuple(key)
+
+
 class RuntimeManager:
     """Manages runtime environments for different languages."""
     
@@ -22,46 +44,201 @@ class RuntimeManager:
         }
     }
 
+    # language -> (version names in string order, version name -> binary path or None)
+    _binary_index: Dict[str, Tuple[Tuple[str, ...], Dict[str, Optional[str]]]] = {}
+    _index_lock = threading.Lock()
+    _runtimes_cache: Optional[List[Dict[str, str]]] = None
+    _runtimes_mtimes: Optional[Tuple[Optional[float], ...]] = None
+    # (language, requested version) -> resolved command; only successful
+    # lookups are kept, so keys are bounded by prefixes of installed versions
+    _commands: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+
     @staticmethod
-    def find_version_dir(base_dir: str, requested_version: str) -> str:
+    def _base_dir_mtimes() -> Tuple[Optional[float], ...]:
+        """Return the mtime of every language base directory (None if missing)."""
+        mtimes = []
+        for config in RuntimeManager.SUPPORTED_LANGUAGES.values():
+            try:
+                mtimes.append(os.stat(config['base_dir']).st_mtime)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    @classmethod
+    def list_runtimes(cls) -> List[Dict[str, str]]:
+        """
+        List all installed runtimes.
+        
+        The directory scan is cached and only repeated when the mtime of a
+        language base directory changes, i.e. when a version is installed
+        or removed.
+        
+        Returns:
+            List of dicts with language, version and runtime keys
+        """
+        mtimes = cls._base_dir_mtimes()
+        if cls._runtimes_cache is not None and mtimes == cls._runtimes_mtimes:
+            return cls._runtimes_cache
+
+        runtimes = []
+        for language, config in cls.SUPPORTED_LANGUAGES.items():
+            base_dir = config['base_dir']
+            if os.path.isdir(base_dir):
+                # DirEntry.is_dir() uses the type from readdir, no stat per entry
+                with os.scandir(base_dir) as entries:
+                    versions = [entry.name for entry in entries if entry.is_dir()]
+                for version in sorted(versions, key=_version_key):
+                    runtimes.append({
+                        "language": language,
+                        "version": version,
+                        "runtime": f"{language}-{version}"
+                    })
+
+        cls._runtimes_cache = runtimes
+        cls._runtimes_mtimes = mtimes
+        return runtimes
+
+    @classmethod
+    def prewarm(cls) -> None:
         """
-        Find the runtime version directory.
+        Fill the runtime caches before the first request arrives.
+        
+        Scans every language's runtimes and resolves the command of each
+        installed version, so lookups by exact version are cache hits.
+        """
+        for runtime in cls.list_runtimes():
+            try:
+                cls.get_runtime_command(runtime['language'], runtime['version'])
+            except RuntimeNotFoundException:
+                # Installed without a usable binary; requests will report it
+                pass
+
+    @classmethod
+    def invalidate_cache(cls) -> None:
+        """Forget cached runtime lookups, e.g. after installing or removing a runtime."""
+        cls._commands = {}
+        with cls._index_lock:
+            cls._binary_index = {}
+        cls._runtimes_cache = None
+        cls._runtimes_mtimes = None
+
+    @staticmethod
+    def _probe_paths(lang_config: Dict) -> Tuple[str, ...]:
+        """Return the candidate binary paths relative to a version directory."""
+        return tuple(
+            os.path.join(lang_config['bin_subdir'], binary_name)
+            for binary_name in lang_config['binary_names']
+        )
+
+    @staticmethod
+    def _find_binary(version_dir: str, probe_paths: Tuple[str, ...]) -> Optional[str]:
+        """Return the first executable runtime binary in a version directory."""
+        for probe_path in probe_paths:
+            binary_path = f"{version_dir}/{probe_path}"
+            # One stat gives both existence and the executable bits
+            try:
+                mode = os.stat(binary_path).st_mode
+            except OSError:
+                continue
+            if stat.S_ISREG(mode) and mode & 0o111:
+                return binary_path
+        return None
+
+    @classmethod
+    def _get_index(
+        cls,
+        language: str,
+        refresh: bool = False
+    ) -> Tuple[Tuple[str, ...], Dict[str, Optional[str]]]:
+        """
+        Return the installed versions of a language and their binaries.
+        
+        The base directory is scanned once and every version directory is
+        probed for its binary; later calls reuse the result.
         
         Args:
-            base_dir: Base directory for the language runtimes
-            requested_version: Requested version (e.g., "3.11" or "3.11.9")
+            language: Supported language name (lowercase)
+            refresh: Rescan even if an index exists
             
         Returns:
-            Full path to the version directory
-            
-        Raises:
-            RuntimeNotFoundException: If the version is not found
+            Tuple of (version names in string order, version name -> binary path or None)
         """
-        # Check if exact version exists
-        exact_path = os.path.join(base_dir, requested_version)
-        if os.path.isdir(exact_path):
-            return exact_path
-
-        # Fallback: find directory with matching prefix
-        if os.path.isdir(base_dir):
-            candidates = sorted(
-                d for d in os.listdir(base_dir)
-                if os.path.isdir(os.path.join(base_dir, d)) 
-                and d.startswith(requested_version)
-            )
-            if candidates:
-                # Return the latest version (last in sorted list)
-                return os.path.join(base_dir, candidates[-1])
+        index = cls._binary_index.get(language)
+        if index is not None and not refresh:
+            return index
 
-        raise RuntimeNotFoundException(
-            f"Runtime version '{requested_version}' not found in {base_dir}"
-        )
+        with cls._index_lock:
+            lang_config = cls.SUPPORTED_LANGUAGES[language]
+            probe_paths = cls._probe_paths(lang_config)
+            binaries = {}
+            try:
+                # DirEntry.is_dir() uses the type from readdir, no stat per entry
+                with os.scandir(lang_config['base_dir']) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            binaries[entry.name] = cls._find_binary(entry.path, probe_paths)
+            except OSError:
+                pass
+            index = (tuple(sorted(binaries)), binaries)
+            cls._binary_index[language] = index
+        return index
 
     @staticmethod
-    def get_runtime_command(language: str, version: str) -> List[str]:
+    def _match_version(versions: Tuple[str, ...], requested_version: str) -> Optional[str]:
+        """
+        Pick the installed version for a requested version.
+        
+        Args:
+            versions: Installed version names in string order
+            requested_version: Requested version (e.g., "3.11" or "3.11.9")
+            
+        Returns:
+            The exact match if installed, otherwise the highest version with
+            requested_version as prefix, or None
+        """
+        if not requested_version:
+            return None  # Every name has the empty prefix; never pick one for it
+
+        start = bisect_left(versions, requested_version)
+        if start < len(versions) and versions[start] == requested_version:
+            return requested_version
+
+        # Names sharing the prefix sort next to each other
+        end = start
+        while end < len(versions) and versions[end].startswith(requested_version):
+            end += 1
+        if end == start:
+            return None
+        # String order is not version order ("3.9" > "3.10")
+        return max(versions[start:end], key=_version_key)
+
+    @classmethod
+    def get_cached_runtime_command(cls, language: str, version: str) -> Optional[List[str]]:
+        """
+        Get the command for a language and version if it is already cached.
+        
+        Never touches the filesystem, so it is safe to call from the event
+        loop; on None, fall back to get_runtime_command().
+        
+        Args:
+            language: Programming language (e.g., 'python', 'node')
+            version: Version string (e.g., '3.11.9', '18.0.0')
+            
+        Returns:
+            List containing the full path to the runtime binary, or None
+        """
+        command = cls._commands.get((language.lower(), version))
+        return list(command) if command is not None else None
+
+    @classmethod
+    def get_runtime_command(cls, language: str, version: str) -> List[str]:
         """
         Get the command to execute code for a specific language and version.
         
+        Successful lookups are memoized per (language, version) until
+        invalidate_cache() is called; misses are not cached and raise on
+        every call.
+        
         Args:
             language: Programming language (e.g., 'python', 'node')
             version: Version string (e.g., '3.11.9', '18.0.0')
@@ -73,8 +250,16 @@ class RuntimeManager:
             UnsupportedLanguageException: If the language is not supported
             RuntimeNotFoundException: If the runtime binary is not found
         """
-        language = language.lower()
-        
+        key = (language.lower(), version)
+        command = cls._commands.get(key)
+        if command is None:
+            command = cls._resolve_runtime_command(*key)
+            cls._commands[key] = command
+        return list(command)
+
+    @staticmethod
+    def _resolve_runtime_command(language: str, version: str) -> Tuple[str, ...]:
+        """Locate the runtime binary on disk (uncached, see get_runtime_command)."""
         if language not in RuntimeManager.SUPPORTED_LANGUAGES:
             raise UnsupportedLanguageException(
                 f"Language '{language}' is not supported. "
@@ -83,23 +268,28 @@ class RuntimeManager:
 
         lang_config = RuntimeManager.SUPPORTED_LANGUAGES[language]
         base_dir = lang_config['base_dir']
-        
-        try:
-            version_dir = RuntimeManager.find_version_dir(base_dir, version)
-        except RuntimeNotFoundException as e:
+
+        versions, binaries = RuntimeManager._get_index(language)
+        version_name = RuntimeManager._match_version(versions, version)
+        if version_name is None or binaries[version_name] is None:
+            # The runtime may have been installed since the last scan
+            versions, binaries = RuntimeManager._get_index(language, refresh=True)
+            version_name = RuntimeManager._match_version(versions, version)
+
+        if version_name is None:
             raise RuntimeNotFoundException(
-                f"Runtime for {language} version {version} not found: {str(e)}"
+                f"Runtime for {language} version {version} not found: "
+                f"Runtime version '{version}' not found in {base_dir}"
             )
 
-        # Try to find the binary
-        bin_dir = os.path.join(version_dir, lang_config['bin_subdir'])
-        
-        for binary_name in lang_config['binary_names']:
-            binary_path = os.path.join(bin_dir, binary_name)
-            if os.path.exists(binary_path) and os.access(binary_path, os.X_OK):
-                return [binary_path]
-
-        raise RuntimeNotFoundException(
-            f"No executable binary found in {bin_dir}. "
-            f"Tried: {', '.join(lang_config['binary_names'])}"
-        )
+        binary_path = binaries[version_name]
+        if binary_path is None:
+            bin_dir = os.path.join(base_dir, version_name, lang_config['bin_subdir'])
+            raise RuntimeNotFoundException(
+                f"No executable binary found in {bin_dir}. "
+                f"Tried: {', '.join(lang_config['binary_names'])}"
+            )
+        return (binary_path,)
+
+# Shared instance; RuntimeManager keeps its caches on the class
+runtime_manager = RuntimeManager()
@@ -1,70 +1,183 @@
 """
 Sandbox management for secure code execution.
 """
+import itertools
+import logging
 import os
 import resource
+import stat
 import subprocess
-from typing import List, Callable, Optional
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Joins the cgroup given as $0, then replaces itself with the real command
+_CGROUP_TRAMPOLINE = 'echo $$ > "$0/cgroup.procs" && exec "$@"'
+
 class SandboxManager:
     """Manages sandbox environment for code execution."""
     
-    _bwrap_available: Optional[bool] = None
+    _bwrap_path: Optional[str] = None  # "" once looked up and not found
     _bwrap_working: Optional[bool] = None
+    _bwrap_probe_ok: Optional[bool] = None  # Result of the most recent probe
+    _probe_lock = threading.Lock()
+    _bwrap_prefix: Dict[bool, Tuple[str, ...]] = {}
+    _prlimit_path: Optional[str] = None  # "" once looked up and not found
+    _cgroup_counter = itertools.count(1)
 
     @classmethod
-    def check_bubblewrap_working(cls) -> bool:
+    def check_bubblewrap_working(cls, force_refresh: bool = False) -> bool:
         """
         Check if bubblewrap actually works (not just installed).
         
+        The probe spawns a process, so its result is cached for the lifetime
+        of the process; create_app() runs it once at startup. Concurrent
+        first calls are serialized so only one of them probes, and it is
+        skipped entirely when the kernel has user namespaces switched off.
+        
+        Once bubblewrap has worked, a failed re-probe never switches jobs to
+        direct mode: the failure may be transient (probe timeout under load,
+        namespace or PID exhaustion), and running unsandboxed is worse than
+        failing jobs. The failure is only reported through get_status().
+        
+        Args:
+            force_refresh: Probe again (a failure cannot downgrade a working sandbox)
+        
         Returns:
-            True if bubblewrap can create namespaces, False otherwise
+            True if jobs run under bubblewrap, False if they run in direct mode
         """
-        if cls._bwrap_working is not None:
+        if cls._bwrap_working is not None and not force_refresh:
             return cls._bwrap_working
+        
+        with cls._probe_lock:
+            # Another thread may have probed while we waited for the lock
+            if cls._bwrap_working is not None and not force_refresh:
+                return cls._bwrap_working
+            
+            cls._bwrap_probe_ok = cls._probe_bubblewrap(force_refresh)
+            if cls._bwrap_probe_ok or not cls._bwrap_working:
+                cls._bwrap_working = cls._bwrap_probe_ok
+            else:
+                # Fail closed: keep sandboxing, jobs fail if bwrap is really broken
+                logger.warning("Bubblewrap re-check failed; staying in sandboxed mode")
             
-        if not cls.validate_bubblewrap_available():
-            cls._bwrap_working = False
+            return cls._bwrap_working
+
+    @classmethod
+    def _probe_bubblewrap(cls, force_refresh: bool = False) -> bool:
+        """Run the bubblewrap checks once (uncached, see check_bubblewrap_working)."""
+        if not cls.validate_bubblewrap_available(force_refresh=force_refresh):
+            return False
+        
+        # Skip the probe when the kernel settings already rule bwrap out
+        if cls._userns_disabled():
             return False
         
         # Test if bwrap can actually create namespaces
         try:
             result = subprocess.run(
-                ["bwrap", "--ro-bind", "/", "/", "--", "echo", "test"],
+                [cls._bwrap_path, "--ro-bind", "/", "/", "--", "echo", "test"],
                 capture_output=True,
                 timeout=2
             )
-            cls._bwrap_working = (result.returncode == 0)
+            return result.returncode == 0
         except (subprocess.TimeoutExpired, OSError, FileNotFoundError):
-            cls._bwrap_working = False
-            
-        return cls._bwrap_working
+            return False
+
+    # Kernel settings that switch off unprivileged user namespaces when "0"
+    _USERNS_SWITCHES = (
+        "/proc/sys/kernel/unprivileged_userns_clone",  # Debian/Ubuntu patch
+        "/proc/sys/user/max_user_namespaces",
+    )
+
+    @classmethod
+    def _userns_disabled(cls) -> bool:
+        """
+        Check whether the kernel forbids the user namespaces bwrap needs.
+        
+        Only a negative answer is reliable: namespaces can still be blocked
+        by seccomp, AppArmor or a container runtime, so an enabled setting
+        does not prove that bwrap works and the probe still has to run.
+        
+        Returns:
+            True if bwrap cannot work, False if it may work
+        """
+        try:
+            # A setuid bwrap does not need unprivileged user namespaces
+            if os.stat(cls._bwrap_path).st_mode & stat.S_ISUID:
+                return False
+        except OSError:
+            return False
+        
+        for path in cls._USERNS_SWITCHES:
+            try:
+                with open(path) as f:
+                    if f.read().strip() == "0":
+                        return True
+            except (OSError, ValueError):
+                continue
+        return False
+
+    @classmethod
+    def get_status(cls, force_refresh: bool = False) -> Tuple[bool, bool]:
+        """
+        Get bubblewrap availability and whether it works, for health checks.
+        
+        Both answers come from the cached checks, so this spawns at most one
+        probe process, and only on the first call or when forced.
+        
+        Args:
+            force_refresh: Detect again (never switches jobs to direct mode)
+        
+        Returns:
+            Tuple of (bubblewrap installed, bubblewrap passed its latest probe);
+            see check_bubblewrap_working() for the mode jobs actually run in
+        """
+        cls.check_bubblewrap_working(force_refresh=force_refresh)
+        return cls.validate_bubblewrap_available(), bool(cls._bwrap_probe_ok)
 
     @staticmethod
-    def create_resource_limiter(memory_mb: int, time_limit: float) -> Callable:
+    def cpu_limit(time_limit: float) -> int:
+        """Return the RLIMIT_CPU soft limit for a time limit (at least 1 second)."""
+        return max(1, int(time_limit))
+
+    @classmethod
+    def create_resource_limiter(
+        cls,
+        memory_mb: int,
+        time_limit: float,
+        use_cgroup: bool = False
+    ) -> Callable:
         """
         Create a function to set resource limits for subprocess.
         
         Args:
             memory_mb: Memory limit in megabytes
             time_limit: CPU time limit in seconds
+            use_cgroup: Memory and process count are enforced by a job
+                cgroup, so only limit CPU time
             
         Returns:
             A callable to be used as preexec_fn in subprocess
         """
+        cpu_soft_limit = cls.cpu_limit(time_limit)
+        
         def set_limits():
             try:
-                # Set virtual memory limit
-                mem_bytes = memory_mb * 1024 * 1024
-                resource.setrlimit(resource.RLIMIT_AS, (mem_bytes, mem_bytes))
-                
                 # Set CPU time limit (soft and hard)
-                cpu_hard_limit = int(time_limit) + 1
                 resource.setrlimit(
                     resource.RLIMIT_CPU, 
-                    (int(time_limit), cpu_hard_limit)
+                    (cpu_soft_limit, cpu_soft_limit + 1)
                 )
+                if use_cgroup:
+                    return
+                
+                # Set virtual memory limit
+                mem_bytes = memory_mb * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_AS, (mem_bytes, mem_bytes))
                 
                 # Prevent fork bombs
                 resource.setrlimit(resource.RLIMIT_NPROC, (16, 16))
@@ -76,23 +189,193 @@ class SandboxManager:
         return set_limits
 
     @classmethod
-    def build_bubblewrap_command(
+    def get_prlimit_path(cls) -> Optional[str]:
+        """
+        Locate the util-linux prlimit binary (cached).
+        
+        Returns:
+            Absolute path to prlimit, or None if it is not installed
+        """
+        if cls._prlimit_path is None:
+            import shutil
+            cls._prlimit_path = shutil.which("prlimit") or ""
+        return cls._prlimit_path or None
+
+    @classmethod
+    def apply_resource_limits(
         cls,
-        workdir: str,
-        runtime_cmd: List[str],
-        internet_enabled: bool = False
-    ) -> List[str]:
+        command: List[str],
+        memory_mb: int,
+        time_limit: float,
+        cgroup_dir: Optional[str] = None
+    ) -> Tuple[List[str], Optional[Callable]]:
         """
-        Build bubblewrap command for sandboxing.
+        Attach resource limits to a command.
+        
+        When prlimit is installed the command is wrapped with it, so no
+        Python code runs between fork and exec and subprocess can use its
+        vfork/posix_spawn fast path (preexec_fn is also unsafe in a threaded
+        server). Otherwise falls back to a preexec_fn limiter.
+        
+        With a job cgroup, memory and process count are left to the cgroup
+        and the command first moves itself into it through a shell
+        trampoline, so every process of the job is accounted there.
         
         Args:
-            workdir: Working directory containing user files
-            runtime_cmd: Command to execute inside sandbox
-            internet_enabled: Whether to allow internet access
+            command: Command list to execute
+            memory_mb: Memory limit in megabytes
+            time_limit: CPU time limit in seconds
+            cgroup_dir: Job cgroup from create_job_cgroup(), if any
             
         Returns:
-            Complete command list for bubblewrap execution
+            Tuple of (command to run, preexec_fn or None)
+        """
+        use_cgroup = cgroup_dir is not None
+        prlimit = cls.get_prlimit_path()
+        if prlimit is None:
+            limited_cmd = command
+            limiter = cls.create_resource_limiter(memory_mb, time_limit, use_cgroup)
+        else:
+            # Same limits as create_resource_limiter
+            cpu_soft_limit = cls.cpu_limit(time_limit)
+            limited_cmd = [prlimit, f"--cpu={cpu_soft_limit}:{cpu_soft_limit + 1}"]
+            if not use_cgroup:
+                mem_bytes = memory_mb * 1024 * 1024
+                limited_cmd.extend((f"--as={mem_bytes}", "--nproc=16"))
+            limited_cmd.append("--")
+            limited_cmd.extend(command)
+            limiter = None
+        
+        if use_cgroup:
+            limited_cmd = ["/bin/sh", "-c", _CGROUP_TRAMPOLINE, cgroup_dir] + limited_cmd
+        return limited_cmd, limiter
+
+    @classmethod
+    def create_job_cgroup(cls, memory_mb: int) -> Optional[str]:
         """
+        Create a cgroup v2 group limiting one job's memory and process count.
+        
+        Requires settings.cgroup_root to be a cgroup the server may manage,
+        with the memory and pids controllers enabled in its
+        cgroup.subtree_control.
+        
+        Args:
+            memory_mb: Memory limit in megabytes
+            
+        Returns:
+            Path of the new cgroup, or None if cgroups are not configured or
+            the group could not be set up (rlimits are used instead)
+        """
+        if not settings.cgroup_root:
+            return None
+        
+        cgroup_dir = os.path.join(
+            settings.cgroup_root, f"job-{os.getpid()}-{next(cls._cgroup_counter)}"
+        )
+        try:
+            os.mkdir(cgroup_dir)
+        except OSError as e:
+            logger.warning("Could not create cgroup %s: %s", cgroup_dir, e)
+            return None
+        
+        try:
+            cls._write_cgroup_file(cgroup_dir, "memory.max", str(memory_mb * 1024 * 1024))
+            cls._write_cgroup_file(cgroup_dir, "pids.max", str(settings.cgroup_pids_max))
+            try:
+                # Keep the job from swapping instead of hitting its limit
+                cls._write_cgroup_file(cgroup_dir, "memory.swap.max", "0")
+            except OSError:
+                # Optional: absent without swap accounting, and creating the
+                # missing file fails with EACCES rather than ENOENT
+                pass
+        except OSError as e:
+            logger.warning("Could not configure cgroup %s: %s", cgroup_dir, e)
+            cls.remove_job_cgroup(cgroup_dir)
+            return None
+        return cgroup_dir
+
+    @staticmethod
+    def _write_cgroup_file(cgroup_dir: str, name: str, value: str) -> None:
+        """Write a value to a cgroup interface file."""
+        with open(os.path.join(cgroup_dir, name), "w") as f:
+            f.write(value)
+
+    @classmethod
+    def remove_job_cgroup(cls, cgroup_dir: str) -> Optional[int]:
+        """
+        Kill whatever is left in a job cgroup and remove it.
+        
+        Args:
+            cgroup_dir: Path returned by create_job_cgroup()
+            
+        Returns:
+            Peak memory usage of the job in bytes, or None if unavailable
+        """
+        try:
+            with open(os.path.join(cgroup_dir, "memory.peak")) as f:
+                peak = int(f.read())
+        except (OSError, ValueError):
+            peak = None
+        
+        try:
+            cls._write_cgroup_file(cgroup_dir, "cgroup.kill", "1")
+        except OSError:
+            pass
+        
+        # Killed processes leave the group asynchronously
+        for _ in range(50):
+            try:
+                os.rmdir(cgroup_dir)
+                break
+            except FileNotFoundError:
+                break
+            except OSError:
+                time.sleep(0.01)
+        else:
+            logger.warning("Could not remove cgroup %s", cgroup_dir)
+        return peak
+
+    @staticmethod
+    def adjust_runtime_command(runtime_cmd: List[str]) -> List[str]:
+        """
+        Map runtime paths to where bubblewrap mounts the packages directory.
+        
+        If packages_dir starts with /app it is mounted at /packages inside
+        the sandbox, to avoid a conflict with the workspace.
+        
+        Args:
+            runtime_cmd: Runtime command with host paths
+            
+        Returns:
+            Runtime command with paths as seen inside the sandbox
+        """
+        if not settings.packages_dir.startswith('/app/'):
+            return runtime_cmd
+        # Replace /app/packages with /packages in runtime command
+        return [
+            cmd.replace(settings.packages_dir, '/packages')
+            for cmd in runtime_cmd
+        ]
+
+    @classmethod
+    def _get_bwrap_prefix(cls, internet_enabled: bool) -> Tuple[str, ...]:
+        """
+        Get the job-independent start of the bubblewrap command.
+        
+        Everything except the workspace bind only depends on the host
+        layout and the network mode, so it is built once per mode and
+        reused for every job.
+        
+        Args:
+            internet_enabled: Whether internet access is allowed
+            
+        Returns:
+            Tuple with the bwrap binary, the read-only binds and the sandbox options
+        """
+        prefix = cls._bwrap_prefix.get(internet_enabled)
+        if prefix is not None:
+            return prefix
+        
         # Determine the packages mount point inside the sandbox
         # If packages_dir starts with /app, mount it elsewhere to avoid conflict with workdir
         packages_src = settings.packages_dir
@@ -102,7 +385,7 @@ class SandboxManager:
             packages_dst = packages_src
         
         cmd = [
-            "bwrap",
+            cls.get_bwrap_path() or "bwrap",
             # Bind essential system directories (read-only)
             "--ro-bind", "/usr", "/usr",
             "--ro-bind", "/lib", "/lib",
@@ -119,23 +402,52 @@ class SandboxManager:
             cmd.extend(["--ro-bind", "/etc/resolv.conf", "/etc/resolv.conf"])
         
         cmd.extend([
-            # Bind user code directory
-            "--bind", workdir, "/app",
-            # Set working directory
+            # Set working directory (the workspace is bound at /app per job)
             "--chdir", "/app",
             # Minimal proc and dev
             "--proc", "/proc",
             "--dev", "/dev",
             # Add tmpfs for /tmp
             "--tmpfs", "/tmp",
-            # Separate arguments from bind mounts
-            "--"
+            # Kill the sandboxed process if bwrap itself is killed (e.g. on timeout)
+            "--die-with-parent",
+            # Detach from the server's session and terminal
+            "--new-session",
+            # Own PID namespace: when the job ends, every process it started
+            # is killed, so nothing lingers in a workspace that gets reused
+            "--unshare-pid",
         ])
-
+        
         # Disable network if not allowed
         if not internet_enabled:
-            # Insert before the "--" separator
-            cmd.insert(-1, "--unshare-net")
+            cmd.append("--unshare-net")
+        
+        prefix = tuple(cmd)
+        cls._bwrap_prefix[internet_enabled] = prefix
+        return prefix
+
+    @classmethod
+    def build_bubblewrap_command(
+        cls,
+        workdir: str,
+        runtime_cmd: List[str],
+        internet_enabled: bool = False
+    ) -> List[str]:
+        """
+        Build bubblewrap command for sandboxing.
+        
+        Args:
+            workdir: Working directory containing user files
+            runtime_cmd: Command to execute inside sandbox
+            internet_enabled: Whether to allow internet access
+            
+        Returns:
+            Complete command list for bubblewrap execution
+        """
+        cmd = list(cls._get_bwrap_prefix(internet_enabled))
+        
+        # Bind user code directory, then separate arguments from bind mounts
+        cmd.extend(("--bind", workdir, "/app", "--"))
 
         # Append the actual command to run (after the "--")
         cmd.extend(runtime_cmd)
@@ -159,20 +471,45 @@ class SandboxManager:
             Command list for direct execution
         """
         # Just run the command directly in the workdir
-        # The resource limits will still apply via preexec_fn
+        # The resource limits will still apply via apply_resource_limits()
         return runtime_cmd
 
     @classmethod
-    def validate_bubblewrap_available(cls) -> bool:
+    def validate_bubblewrap_available(cls, force_refresh: bool = False) -> bool:
         """
         Check if bubblewrap is available on the system.
         
+        Args:
+            force_refresh: Discard the cached result and look up bwrap again
+        
         Returns:
             True if bubblewrap is available, False otherwise
         """
-        if cls._bwrap_available is not None:
-            return cls._bwrap_available
-            
-        import shutil
-        cls._bwrap_available = shutil.which("bwrap") is not None
-        return cls._bwrap_available
+        return cls.get_bwrap_path(force_refresh=force_refresh) is not None
+
+    @classmethod
+    def get_bwrap_path(cls, force_refresh: bool = False) -> Optional[str]:
+        """
+        Locate the bwrap binary (cached).
+        
+        The absolute path is used as argv[0] of sandboxed commands, so the
+        child doesn't search PATH on every exec.
+        
+        Args:
+            force_refresh: Discard the cached path and search PATH again
+        
+        Returns:
+            Absolute path to bwrap, or None if it is not installed
+        """
+        if cls._bwrap_path is None or force_refresh:
+            import shutil
+            path = shutil.which("bwrap") or ""
+            if path != cls._bwrap_path:
+                # Cached command prefixes start with the old path
+                cls._bwrap_prefix = {}
+            cls._bwrap_path = path
+        return cls._bwrap_path or None
+
+
+# Shared instance; SandboxManager keeps its caches on the class
+sandbox_manager = SandboxManager()
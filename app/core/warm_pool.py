@@ -0,0 +1,750 @@
+"""
+Pool of warm interpreter processes for fast code execution.
+
+Starting an interpreter dominates the run time of short programs. A warm
+worker is a sandboxed interpreter running a small supervisor that stays
+alive between jobs. Before each job it forks a child that waits for the
+job; the child receives the job itself, applies the resource limits and
+runs the user's main file, so it starts with the interpreter already
+initialised. The supervisor never sees a job's arguments, input or output,
+so nothing from one job is in memory the next job's child inherits.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import select
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+from app.core.sandbox import sandbox_manager
+from app.core.workspace_pool import WorkspacePool, remove_tree
+from app.exceptions import SandboxExecutionException
+from app.models import ExecRequest
+
+logger = logging.getLogger(__name__)
+
+# Extra time the server waits for a worker's reply beyond the job's time limit
+_RESPONSE_GRACE = 5.0
+
+# Failures that leave a worker in an unknown state; it is closed on any of them
+_WORKER_ERRORS = (OSError, EOFError, ValueError, KeyError, TypeError)
+
+# Largest job message the supervisor accepts (see WarmWorkerPool.supports)
+_MAX_JOB_SIZE = 65536
+_MAX_ARGV_CHARS = 4096
+
+# Supervisor run inside the sandbox as `python -c <source> <mode>`, with a
+# SOCK_SEQPACKET socket as its stdin.
+#
+# Protocol, per job:
+#   server -> child:      JSON {main, args, timeout, cpu_limit, memory_limit},
+#                         with the job's stdin, stdout and stderr pipes
+#                         attached as SCM_RIGHTS
+#   supervisor -> server: JSON {exit_code, timed_out, maxrss_kb, reusable}
+#                         once every process of the job is gone
+#
+# Only the pre-forked child ever receives from the socket; the supervisor
+# learns the timeout through a private pipe when the job starts.
+#
+# In "isolated" mode the supervisor runs in its own PID namespace (under
+# bwrap --unshare-pid it is PID 2, bwrap's init is PID 1). After each job it
+# kills every leftover process and empties the sandbox's private /tmp and
+# /dev/shm, so nothing survives into the next job.
+_SUPERVISOR_SOURCE = r'''
+import array, atexit, builtins, ctypes, json, os, resource, select, signal, socket, stat, sys, threading, time, traceback, types
+
+ISOLATED = sys.argv[1] == "isolated" and os.getpid() <= 2
+MAX_JOB_SIZE = %d
+SCRATCH = ("/tmp", "/dev/shm")
+JOBS = socket.socket(fileno=os.dup(0))
+_null = os.open(os.devnull, os.O_RDWR)
+os.dup2(_null, 0)
+os.dup2(_null, 1)
+os.close(_null)
+BASE_PATH = sys.path[1:]
+SCRATCH_MODES = {}
+for _path in SCRATCH:
+    try:
+        SCRATCH_MODES[_path] = stat.S_IMODE(os.stat(_path).st_mode)
+    except OSError:
+        pass
+
+# Wake up from select() when a child exits
+WAKE_R, WAKE_W = os.pipe()
+os.set_blocking(WAKE_R, False)
+os.set_blocking(WAKE_W, False)
+signal.set_wakeup_fd(WAKE_W)
+signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+
+def set_dumpable(flag):
+    # Keep jobs from attaching to the supervisor with ptrace or /proc/<pid>/mem
+    try:
+        ctypes.CDLL(None, use_errno=True).prctl(4, flag, 0, 0, 0)  # PR_SET_DUMPABLE
+    except (OSError, AttributeError):
+        pass
+
+
+def exit_code_of(code):
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code & 0xFF
+    print(code, file=sys.stderr)
+    return 1
+
+
+def run_child(started_w):
+    fd_size = array.array("i").itemsize
+    msg, ancdata, _, _ = JOBS.recvmsg(MAX_JOB_SIZE, socket.CMSG_SPACE(3 * fd_size))
+    if not msg:
+        os._exit(0)  # The server closed the worker
+    fds = array.array("i")
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - len(data) %% fd_size])
+    stdin_r, out_w, err_w = fds
+    job = json.loads(msg.decode("utf-8"))
+
+    os.setpgid(0, 0)
+    os.write(started_w, repr(float(job["timeout"])).encode("ascii"))
+    os.dup2(stdin_r, 0)
+    os.dup2(out_w, 1)
+    os.dup2(err_w, 2)
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    os.closerange(3, resource.getrlimit(resource.RLIMIT_NOFILE)[0])
+    set_dumpable(1)
+
+    mem_bytes = job["memory_limit"] * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (mem_bytes, mem_bytes))
+    resource.setrlimit(resource.RLIMIT_CPU, (job["cpu_limit"], job["cpu_limit"] + 1))
+    resource.setrlimit(resource.RLIMIT_NPROC, (16, 16))
+
+    # Set up __main__ the way `python <main>` would
+    main = os.path.abspath(job["main"])
+    sys.argv = [job["main"]] + job["args"]
+    sys.path[:] = [os.path.dirname(main)] + BASE_PATH
+    module = types.ModuleType("__main__")
+    module.__file__ = main
+    module.__builtins__ = builtins
+    sys.modules["__main__"] = module
+    code = 0
+    try:
+        with open(main, "rb") as f:
+            source = f.read()
+        exec(compile(source, main, "exec"), module.__dict__)
+    except SystemExit as e:
+        code = exit_code_of(e.code)
+    except BaseException:
+        # Hide the supervisor's own frames from the traceback
+        etype, value, tb = sys.exc_info()
+        while tb is not None and tb.tb_frame.f_code.co_filename != main:
+            tb = tb.tb_next
+        traceback.print_exception(etype, value, tb)
+        code = 1
+    # Finalize like the interpreter: join non-daemon threads, then atexit
+    try:
+        threading._shutdown()
+    except BaseException:
+        pass
+    try:
+        atexit._run_exitfuncs()
+    except BaseException:
+        pass
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except BaseException:
+            pass
+    os._exit(code)
+
+
+def wipe(path):
+    # Empty a directory the job may have locked down; False if anything is left
+    clean = True
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    os.chmod(entry.path, 0o700)
+                    clean = wipe(entry.path) and clean
+                    os.rmdir(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except OSError:
+                clean = False
+    return clean
+
+
+def empty_scratch(path, mode):
+    try:
+        os.chmod(path, mode)
+    except OSError:
+        pass
+    return wipe(path)
+
+
+def clean_scratch():
+    # Runs in a throwaway child so the job's file names never reach the supervisor
+    pid = os.fork()
+    if pid == 0:
+        clean = False
+        try:
+            clean = all([empty_scratch(path, mode) for path, mode in SCRATCH_MODES.items()])
+        finally:
+            os._exit(0 if clean else 1)
+    _, status = os.waitpid(pid, 0)
+    return status == 0
+
+
+def wait_child(pid, deadline):
+    while True:
+        finished, status, rusage = os.wait4(pid, os.WNOHANG)
+        if finished:
+            return status, rusage
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None, None
+        select.select([WAKE_R], [], [], remaining)
+        try:
+            while os.read(WAKE_R, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+
+def run_job():
+    # Fork before the job exists, so the child inherits nothing of it
+    started_r, started_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(started_r)
+            run_child(started_w)
+        finally:
+            os._exit(1)
+    os.close(started_w)
+    try:
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+
+    started = b""
+    while True:
+        chunk = os.read(started_r, 64)
+        if not chunk:
+            break
+        started += chunk
+    os.close(started_r)
+    if not started:
+        _, status = os.waitpid(pid, 0)
+        if status != 0:
+            sys.exit(1)  # The child failed before the job started
+        return False
+
+    timed_out = False
+    status, rusage = wait_child(pid, time.monotonic() + float(started))
+    if status is None:
+        timed_out = True
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+        _, status, rusage = os.wait4(pid, 0)
+
+    # Nothing started by the job may outlive it
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+    reusable = True
+    if ISOLATED:
+        try:
+            os.kill(-1, signal.SIGKILL)
+        except OSError:
+            pass
+        # Reap orphans reparented to us when we are the namespace's init
+        try:
+            while True:
+                os.waitpid(-1, 0)
+        except ChildProcessError:
+            pass
+        reusable = clean_scratch()
+
+    if os.WIFSIGNALED(status):
+        exit_code = -os.WTERMSIG(status)
+    else:
+        exit_code = os.WEXITSTATUS(status)
+    JOBS.send(json.dumps({
+        "exit_code": exit_code,
+        "timed_out": timed_out,
+        "maxrss_kb": rusage.ru_maxrss,
+        "reusable": reusable,
+    }).encode("utf-8"))
+    return reusable
+
+
+set_dumpable(0)
+while run_job():
+    pass
+''' % _MAX_JOB_SIZE
+
+
+class _JobStreams:
+    """The server's ends of one warm job's stdin, stdout and stderr pipes."""
+
+    def __init__(self, stdin_w: int, out_r: int, err_r: int, stdin_data: bytes):
+        self.stdin_w = stdin_w
+        self.out_r = out_r
+        self.err_r = err_r
+        self.open_fds = [stdin_w, out_r, err_r]
+        self.buffers = {out_r: bytearray(), err_r: bytearray()}
+        self.limits = {out_r: settings.max_output_size + 1, err_r: settings.max_stderr_size + 1}
+        # Output pipes not at EOF yet, and stdin while data is left to write
+        self.readers = [out_r, err_r]
+        self.writers = [stdin_w]
+        self.view = memoryview(stdin_data)
+        if not stdin_data:
+            self.close_stdin()
+
+    def write_stdin(self) -> bool:
+        """Write the next chunk of stdin; return True once all of it is written."""
+        try:
+            self.view = self.view[os.write(self.stdin_w, self.view[:select.PIPE_BUF]):]
+        except BrokenPipeError:
+            # The job does not read its input; drop the rest
+            self.view = self.view[:0]
+        return not self.view
+
+    def close_stdin(self) -> None:
+        """Close the job's stdin so it sees end of file."""
+        if self.stdin_w in self.open_fds:
+            self.open_fds.remove(self.stdin_w)
+            os.close(self.stdin_w)
+        self.writers = []
+
+    def read_output(self, fd: int) -> bool:
+        """Read a chunk of stdout or stderr; return False at end of file."""
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            self.readers.remove(fd)
+            return False
+        room = self.limits[fd] - len(self.buffers[fd])
+        if room > 0:
+            self.buffers[fd] += chunk[:room]
+        return True
+
+    def drain(self) -> Tuple[bytes, bytes]:
+        """
+        Collect the rest of the output once the job has exited.
+
+        Returns:
+            Tuple of (stdout bytes, stderr bytes)
+        """
+        self.close_stdin()
+        # What is left in the pipes is the rest of the job's output; a
+        # process that escaped the kill cannot make this loop run forever
+        for fd in self.readers:
+            os.set_blocking(fd, False)
+            buffer, limit = self.buffers[fd], self.limits[fd]
+            try:
+                while len(buffer) < limit:
+                    chunk = os.read(fd, 65536)
+                    if not chunk:
+                        break
+                    buffer += chunk[:limit - len(buffer)]
+            except BlockingIOError:
+                pass
+        return bytes(self.buffers[self.out_r]), bytes(self.buffers[self.err_r])
+
+    def close(self) -> None:
+        """Close every pipe end still open."""
+        for fd in self.open_fds:
+            os.close(fd)
+        self.open_fds = []
+
+
+class WarmWorker:
+    """A long-lived sandboxed supervisor bound to its own workspace directory."""
+
+    def __init__(self, runtime_cmd: List[str], internet_enabled: bool):
+        """
+        Start a supervisor process.
+
+        Args:
+            runtime_cmd: Runtime binary command from RuntimeManager
+            internet_enabled: Whether the sandbox allows internet access
+        """
+        self.workdir = tempfile.mkdtemp(prefix="codengine-warm-", dir=settings.workspace_dir)
+        self.use_bwrap = sandbox_manager.check_bubblewrap_working()
+        self.reusable = True
+
+        if self.use_bwrap:
+            supervisor_cmd = sandbox_manager.adjust_runtime_command(runtime_cmd) + [
+                "-c", _SUPERVISOR_SOURCE, "isolated"
+            ]
+            command = sandbox_manager.build_bubblewrap_command(
+                workdir=self.workdir,
+                runtime_cmd=supervisor_cmd,
+                internet_enabled=internet_enabled
+            )
+        else:
+            command = sandbox_manager.build_direct_command(
+                workdir=self.workdir,
+                runtime_cmd=runtime_cmd + ["-c", _SUPERVISOR_SOURCE, "shared"]
+            )
+
+        self.sock, worker_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            self.proc = subprocess.Popen(
+                command,
+                stdin=worker_sock,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                cwd=None if self.use_bwrap else self.workdir
+            )
+        except OSError:
+            self.sock.close()
+            remove_tree(self.workdir, ignore_errors=True)
+            raise
+        finally:
+            worker_sock.close()
+
+    def alive(self) -> bool:
+        """Return True while the supervisor is running and can take another job."""
+        return self.reusable and self.proc.poll() is None
+
+    def run(
+        self,
+        main_file: str,
+        args: List[str],
+        stdin_data: bytes,
+        memory_limit: int,
+        time_limit: float
+    ) -> dict:
+        """
+        Run a job whose files are already in the worker's workspace.
+
+        The job's stdin, stdout and stderr are pipes between this process and
+        the job, so its data never passes through the supervisor.
+
+        Args:
+            main_file: Name of the file to execute, relative to the workspace
+            args: Command-line arguments
+            stdin_data: UTF-8 encoded input for stdin
+            memory_limit: Memory limit in MB
+            time_limit: Time limit in seconds
+
+        Returns:
+            Dictionary with stdout, stderr, exit_code, signal, memory
+            (same shape as CodeExecutor._run_sandboxed_process)
+
+        Raises:
+            SandboxExecutionException: If the worker fails or stops responding
+        """
+        deadline = time.monotonic() + time_limit + _RESPONSE_GRACE
+        try:
+            streams = self._start_job(main_file, args, stdin_data, memory_limit, time_limit)
+            try:
+                meta = self._wait_for_report(streams, deadline)
+                return self._finish_job(meta, streams)
+            finally:
+                streams.close()
+        except _WORKER_ERRORS as e:
+            self.close()
+            raise SandboxExecutionException(f"Warm worker failed: {str(e)}")
+
+    async def run_async(
+        self,
+        main_file: str,
+        args: List[str],
+        stdin_data: bytes,
+        memory_limit: int,
+        time_limit: float
+    ) -> dict:
+        """
+        Asyncio counterpart of run(); the job's pipes are served by the event loop.
+
+        Raises:
+            SandboxExecutionException: If the worker fails or stops responding
+        """
+        deadline = time.monotonic() + time_limit + _RESPONSE_GRACE
+        try:
+            streams = self._start_job(main_file, args, stdin_data, memory_limit, time_limit)
+            try:
+                meta = await self._wait_for_report_async(streams, deadline)
+                return self._finish_job(meta, streams)
+            finally:
+                streams.close()
+        except _WORKER_ERRORS as e:
+            self.close()
+            raise SandboxExecutionException(f"Warm worker failed: {str(e)}")
+        except asyncio.CancelledError:
+            # The job may still be running; its report would reach the next job
+            self.close()
+            raise
+
+    def _start_job(
+        self,
+        main_file: str,
+        args: List[str],
+        stdin_data: bytes,
+        memory_limit: int,
+        time_limit: float
+    ) -> "_JobStreams":
+        """Hand a job and its pipes to the waiting child and return our pipe ends."""
+        job = json.dumps({
+            "main": main_file,
+            "args": args,
+            "timeout": time_limit + 0.5,  # Same margin as the cold path
+            "cpu_limit": max(1, int(time_limit)),
+            "memory_limit": memory_limit
+        }).encode('utf-8')
+
+        stdin_r, stdin_w = os.pipe()
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        try:
+            socket.send_fds(self.sock, [job], [stdin_r, out_w, err_w])
+        except OSError:
+            for fd in (stdin_w, out_r, err_r):
+                os.close(fd)
+            raise
+        finally:
+            for fd in (stdin_r, out_w, err_w):
+                os.close(fd)
+        return _JobStreams(stdin_w, out_r, err_r, stdin_data)
+
+    def _receive_report(self) -> dict:
+        """Read the supervisor's report on a finished job."""
+        report = self.sock.recv(_MAX_JOB_SIZE)
+        if not report:
+            raise EOFError("worker exited")
+        return json.loads(report)
+
+    def _wait_for_report(self, streams: "_JobStreams", deadline: float) -> dict:
+        """Serve the job's pipes with select() until the supervisor reports."""
+        sock_fd = self.sock.fileno()
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("worker did not reply in time")
+            readable, writable, _ = select.select(
+                streams.readers + [sock_fd], streams.writers, [], remaining
+            )
+            if writable and streams.write_stdin():
+                streams.close_stdin()
+            for fd in readable:
+                if fd == sock_fd:
+                    return self._receive_report()
+                streams.read_output(fd)
+
+    async def _wait_for_report_async(self, streams: "_JobStreams", deadline: float) -> dict:
+        """Serve the job's pipes from the event loop until the supervisor reports."""
+        loop = asyncio.get_running_loop()
+        sock_fd = self.sock.fileno()
+        report = loop.create_future()
+
+        def on_report() -> None:
+            loop.remove_reader(sock_fd)
+            try:
+                report.set_result(self._receive_report())
+            except Exception as e:
+                report.set_exception(e)
+
+        def on_output(fd: int) -> None:
+            if not streams.read_output(fd):
+                loop.remove_reader(fd)
+
+        def on_stdin() -> None:
+            if streams.write_stdin():
+                loop.remove_writer(streams.stdin_w)
+                streams.close_stdin()
+
+        loop.add_reader(sock_fd, on_report)
+        for fd in streams.readers:
+            loop.add_reader(fd, on_output, fd)
+        if streams.writers:
+            loop.add_writer(streams.stdin_w, on_stdin)
+        try:
+            return await asyncio.wait_for(report, max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            raise TimeoutError("worker did not reply in time")
+        finally:
+            loop.remove_reader(sock_fd)
+            for fd in (streams.out_r, streams.err_r):
+                loop.remove_reader(fd)
+            if streams.writers:
+                loop.remove_writer(streams.stdin_w)
+
+    def _finish_job(self, meta: dict, streams: "_JobStreams") -> dict:
+        """Build the result dictionary from the supervisor's report and the output."""
+        stdout, stderr = streams.drain()
+        exit_code = meta['exit_code']
+        memory = meta['maxrss_kb'] * 1024  # maxrss is in KB on Linux
+        self.reusable = meta['reusable']
+
+        signal_name = None
+        if meta['timed_out']:
+            stderr = b"TIMEOUT: Execution exceeded time limit\n" + stderr
+            exit_code = 124  # Standard timeout exit code
+            signal_name = "SIGKILL"
+        elif exit_code < 0:
+            signal_name = f"signal_{abs(exit_code)}"
+
+        return {
+            'stdout': stdout,
+            'stderr': stderr,
+            'exit_code': exit_code,
+            'signal': signal_name,
+            'memory': memory
+        }
+
+    def close(self) -> None:
+        """Stop the supervisor and remove its workspace."""
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        self.sock.close()
+        remove_tree(self.workdir, ignore_errors=True)
+
+
+class WarmWorkerPool:
+    """Keeps warm workers per (runtime, network mode) and hands them out per job."""
+
+    # Languages with a supervisor; everything else uses the cold path
+    SUPPORTED_LANGUAGES = frozenset({'python'})
+
+    def __init__(self, size: int):
+        """
+        Create an empty pool; workers are started on first use.
+
+        Args:
+            size: Maximum number of workers per (runtime, network mode)
+        """
+        self.size = size
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[Tuple[str, ...], bool], List[WarmWorker]] = {}
+        self._counts: Dict[Tuple[Tuple[str, ...], bool], int] = {}
+        atexit.register(self.close)
+
+    def supports(self, request: ExecRequest) -> bool:
+        """Return True if the job can run on a warm worker."""
+        if self.size <= 0 or request.language not in self.SUPPORTED_LANGUAGES:
+            return False
+        # The job description has to fit in a single message to the worker
+        argv_chars = len(request.files[0].name) + sum(len(arg) for arg in request.args)
+        return argv_chars <= _MAX_ARGV_CHARS
+
+    @contextmanager
+    def acquire(
+        self,
+        runtime_cmd: List[str],
+        internet_enabled: bool
+    ) -> Iterator[Optional[WarmWorker]]:
+        """
+        Borrow a warm worker for one job.
+
+        Starts a new worker if fewer than size exist for this runtime.
+
+        Args:
+            runtime_cmd: Runtime binary command from RuntimeManager
+            internet_enabled: Whether the job may access the internet
+
+        Yields:
+            An idle WarmWorker, or None if all are busy (use the cold path)
+        """
+        key = (tuple(runtime_cmd), internet_enabled)
+        worker, spawn = self._take(key)
+        if spawn:
+            worker = self._start(key, runtime_cmd, internet_enabled)
+
+        try:
+            yield worker
+        finally:
+            if worker is not None:
+                self._release(key, worker)
+
+    @asynccontextmanager
+    async def acquire_async(
+        self,
+        runtime_cmd: List[str],
+        internet_enabled: bool
+    ) -> AsyncIterator[Optional[WarmWorker]]:
+        """
+        Async variant of acquire() that starts and cleans up workers in a thread.
+
+        Yields:
+            An idle WarmWorker, or None if all are busy (use the cold path)
+        """
+        key = (tuple(runtime_cmd), internet_enabled)
+        worker, spawn = self._take(key)
+        if spawn:
+            worker = await asyncio.to_thread(self._start, key, runtime_cmd, internet_enabled)
+
+        try:
+            yield worker
+        finally:
+            if worker is not None:
+                # User code may leave arbitrarily many files behind
+                await asyncio.to_thread(self._release, key, worker)
+
+    def _take(self, key: Tuple[Tuple[str, ...], bool]) -> Tuple[Optional[WarmWorker], bool]:
+        """
+        Pop an idle worker, or reserve room for a new one.
+
+        Returns:
+            Tuple of (idle worker or None, whether the caller should start one)
+        """
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), False
+            if self._counts.get(key, 0) < self.size:
+                self._counts[key] = self._counts.get(key, 0) + 1
+                return None, True
+        return None, False
+
+    def _start(
+        self,
+        key: Tuple[Tuple[str, ...], bool],
+        runtime_cmd: List[str],
+        internet_enabled: bool
+    ) -> Optional[WarmWorker]:
+        """Start a worker in a slot reserved by _take(); None if it fails."""
+        try:
+            return WarmWorker(runtime_cmd, internet_enabled)
+        except OSError as e:
+            logger.warning("Could not start warm worker for %s: %s", runtime_cmd[0], e)
+            with self._lock:
+                self._counts[key] -= 1
+            return None
+
+    def _release(self, key: Tuple[Tuple[str, ...], bool], worker: WarmWorker) -> None:
+        """Return a worker to the pool, or retire it if it is no longer usable."""
+        if worker.alive() and WorkspacePool.clear(worker.workdir):
+            with self._lock:
+                self._idle.setdefault(key, []).append(worker)
+            return
+
+        worker.close()
+        with self._lock:
+            self._counts[key] -= 1
+
+    def close(self) -> None:
+        """Stop all idle workers; busy workers are retired on release."""
+        with self._lock:
+            workers = [worker for idle in self._idle.values() for worker in idle]
+            self._idle.clear()
+            self.size = 0
+        for worker in workers:
+            worker.close()
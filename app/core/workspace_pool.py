@@ -0,0 +1,166 @@
+"""
+Pool of reusable workspace directories for code execution.
+"""
+import asyncio
+import atexit
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def remove_tree(path: str, ignore_errors: bool = False, _repeated: bool = False) -> None:
+    """
+    Remove a directory tree even if user code revoked permissions inside it.
+
+    Like tempfile.TemporaryDirectory, entries that cannot be removed get
+    their parent (and, for directories, themselves) made writable again
+    before retrying. Symlinks are never chmodded, so their targets are safe.
+
+    Args:
+        path: Directory to remove
+        ignore_errors: Swallow errors that remain after retrying
+
+    Raises:
+        OSError: If the tree cannot be removed and ignore_errors is False
+    """
+    def onexc(func, name, exc):
+        if isinstance(exc, FileNotFoundError):
+            return
+        if isinstance(exc, PermissionError) and not (_repeated and name == path):
+            try:
+                if name != path:
+                    os.chmod(os.path.dirname(name), 0o700)
+                if os.path.isdir(name) and not os.path.islink(name):
+                    os.chmod(name, 0o700)
+                    remove_tree(name, ignore_errors, _repeated=(name == path))
+                else:
+                    os.unlink(name)
+                return
+            except FileNotFoundError:
+                return
+            except OSError as retry_exc:
+                exc = retry_exc
+        if not ignore_errors:
+            raise exc
+
+    if sys.version_info >= (3, 12):
+        shutil.rmtree(path, onexc=onexc)
+    else:
+        shutil.rmtree(path, onerror=lambda func, name, info: onexc(func, name, info[1]))
+
+
+class WorkspacePool:
+    """Keeps pre-created workspace directories and reuses them across jobs."""
+
+    def __init__(self, size: int, root: Optional[str] = None):
+        """
+        Create the pool and its directories.
+
+        Args:
+            size: Number of directories kept ready for reuse
+            root: Parent directory for the workspaces (system temp dir if None)
+        """
+        self.size = size
+        self.root = root
+        if root:
+            os.makedirs(root, mode=0o700, exist_ok=True)
+        self._lock = threading.Lock()
+        self._idle: List[str] = [self._create() for _ in range(size)]
+        self._closed = False
+        atexit.register(self.close)
+
+    def _create(self) -> str:
+        """Create a new, empty workspace directory."""
+        return tempfile.mkdtemp(prefix="codengine-ws-", dir=self.root)
+
+    @contextmanager
+    def acquire(self) -> Iterator[str]:
+        """
+        Borrow an empty workspace directory for the duration of a job.
+
+        When every pooled directory is in use a fresh one is created, so
+        callers never block; it is added to the pool on release if there
+        is room, otherwise removed.
+
+        Yields:
+            Path of an empty workspace directory
+        """
+        with self._lock:
+            workdir = self._idle.pop() if self._idle else None
+        if workdir is None:
+            workdir = self._create()
+
+        try:
+            yield workdir
+        finally:
+            self.release(workdir)
+
+    @asynccontextmanager
+    async def acquire_async(self) -> AsyncIterator[str]:
+        """
+        Async variant of acquire() that touches the filesystem in a thread.
+
+        Yields:
+            Path of an empty workspace directory
+        """
+        with self._lock:
+            workdir = self._idle.pop() if self._idle else None
+        if workdir is None:
+            workdir = await asyncio.to_thread(self._create)
+
+        try:
+            yield workdir
+        finally:
+            # User code may leave arbitrarily many files behind
+            await asyncio.to_thread(self.release, workdir)
+
+    def release(self, workdir: str) -> None:
+        """
+        Empty a workspace and return it to the pool.
+
+        Args:
+            workdir: Directory previously handed out by acquire()
+        """
+        if self.clear(workdir):
+            with self._lock:
+                if not self._closed and len(self._idle) < self.size:
+                    self._idle.append(workdir)
+                    return
+        remove_tree(workdir, ignore_errors=True)
+
+    @staticmethod
+    def clear(workdir: str) -> bool:
+        """
+        Remove everything inside a workspace, keeping the directory itself.
+
+        Returns:
+            True if the directory is empty and safe to reuse, False otherwise
+        """
+        try:
+            # User code may have changed the permissions of its workspace
+            os.chmod(workdir, 0o700)
+            with os.scandir(workdir) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        remove_tree(entry.path)
+                    else:
+                        os.unlink(entry.path)
+        except OSError as e:
+            logger.warning("Discarding workspace %s: %s", workdir, e)
+            return False
+        return True
+
+    def close(self) -> None:
+        """Remove all idle workspaces; directories in use are removed on release."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for workdir in idle:
+            remove_tree(workdir, ignore_errors=True)
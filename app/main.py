@@ -3,13 +3,17 @@ FastAPI application initialization.
 """
 import logging
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.api.routes import router
+from app.core import runtime_manager, sandbox_manager
 from app.exceptions import CodeEngineException
 
+_LOG_LEVEL = getattr(logging, settings.log_level.upper(), logging.INFO)
+_LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
 
 def create_app() -> FastAPI:
     """
@@ -18,36 +22,41 @@ def create_app() -> FastAPI:
     Returns:
         Configured FastAPI application instance
     """
-    # Configure logging
-    logging.basicConfig(
-        level=getattr(logging, settings.log_level),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    # Configure logging (once; the server or an earlier call may have done it)
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=_LOG_LEVEL, format=_LOG_FORMAT)
     
     # Create FastAPI app
     app = FastAPI(
         title=settings.api_title,
         version=settings.api_version,
-        description=settings.api_description
+        description=settings.api_description,
+        # orjson serializes large stdout/stderr strings much faster than json
+        default_response_class=ORJSONResponse
     )
     
-    # Add CORS middleware
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
+    # Add CORS middleware (only needed for browser clients)
+    if settings.enable_cors:
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_credentials=True,
+            allow_methods=["GET", "POST"],
+            allow_headers=["*"],
+        )
     
     # Include routers
     app.include_router(router)
     
+    # Probe bubblewrap and scan runtimes now so the first request doesn't pay for it
+    sandbox_manager.check_bubblewrap_working()
+    runtime_manager.prewarm()
+    
     # Exception handlers
     @app.exception_handler(CodeEngineException)
     async def code_engine_exception_handler(request, exc: CodeEngineException):
         """Handle CodeEngineException."""
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"error": str(exc)}
         )
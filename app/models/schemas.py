@@ -1,17 +1,34 @@
 """
 Pydantic schemas for request/response models.
 """
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from pydantic import (
+    BaseModel, ConfigDict, Field, PrivateAttr, StringConstraints, field_validator, model_validator
+)
+from typing import Annotated, List, Optional
 from app.config import settings
 
 
+def _utf8_size(text: str) -> int:
+    """Return the UTF-8 encoded size of text, without encoding ASCII text."""
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+
 class File(BaseModel):
     """Represents a file to be executed."""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     name: str = Field(..., description="File name (can include relative path)")
-    content: str = Field(..., description="File content")
+    # A character is at least one byte, so this bound is exact only for ASCII;
+    # validate_content_size checks the UTF-8 size
+    content: Annotated[
+        str, StringConstraints(max_length=settings.max_file_size)
+    ] = Field(..., description="File content")
+
+    # UTF-8 size of content, set by the size check when it had to encode it
+    _byte_size: Optional[int] = PrivateAttr(default=None)
 
-    @validator('name')
+    @field_validator('name')
+    @classmethod
     def validate_name(cls, v):
         if not v or v.strip() == "":
             raise ValueError("File name cannot be empty")
@@ -19,30 +36,43 @@ class File(BaseModel):
             raise ValueError("File name cannot be an absolute path")
         return v
     
-    @validator('content')
-    def validate_content_size(cls, v):
-        size = len(v.encode('utf-8'))
+    @model_validator(mode='after')
+    def validate_content_size(self):
         max_size = settings.max_file_size
+        # A character takes at most 4 bytes in UTF-8, so short content fits
+        # without encoding it
+        if len(self.content) <= max_size // 4:
+            return self
+        
+        size = _utf8_size(self.content)
         if size > max_size:
             raise ValueError(
                 f"File content too large: {size} bytes. "
                 f"Maximum allowed: {max_size} bytes ({max_size // 1024} KB)"
             )
-        return v
+        # Kept for ExecRequest's total size check
+        self._byte_size = size
+        return self
 
 
 class ExecRequest(BaseModel):
     """Request model for code execution."""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     language: str = Field(..., description="Programming language (e.g., 'python', 'node')")
     version: str = Field(..., description="Language version (e.g., '3.11.9', '3.12')")
-    files: List[File] = Field(..., min_items=1, description="List of files to execute")
+    files: List[File] = Field(
+        ..., min_length=1, max_length=settings.max_files_count,
+        description="List of files to execute"
+    )
     stdin: str = Field(default="", description="Standard input for the program")
     args: List[str] = Field(default_factory=list, description="Command-line arguments")
     time_limit: float = Field(default=90.0, ge=0.1, le=300.0, description="Time limit in seconds")
     memory_limit: int = Field(default=256, ge=32, le=2048, description="Memory limit in MB")
     internet: bool = Field(default=True, description="Enable internet access in sandbox")
 
-    @validator('language')
+    @field_validator('language')
+    @classmethod
     def validate_language(cls, v):
         v = v.lower()
         supported = ['python', 'node']
@@ -50,17 +80,20 @@ class ExecRequest(BaseModel):
             raise ValueError(f"Language '{v}' not supported. Supported: {', '.join(supported)}")
         return v
     
-    @validator('files')
-    def validate_files_count_and_size(cls, v):
-        # Check file count
-        if len(v) > settings.max_files_count:
-            raise ValueError(
-                f"Too many files: {len(v)}. Maximum allowed: {settings.max_files_count}"
-            )
-        
-        # Check total size
-        total_size = sum(len(f.content.encode('utf-8')) for f in v)
+    @field_validator('files')
+    @classmethod
+    def validate_files_size(cls, v):
+        # File count is bounded by the field constraints
+        # Check total size (skip encoding when even 4 bytes per character fits)
         max_total = settings.max_total_files_size
+        if sum(len(f.content) for f in v) <= max_total // 4:
+            return v
+        
+        # Reuse the sizes File already measured instead of encoding again
+        total_size = sum(
+            f._byte_size if f._byte_size is not None else _utf8_size(f.content)
+            for f in v
+        )
         if total_size > max_total:
             raise ValueError(
                 f"Total files size too large: {total_size} bytes. "
@@ -72,6 +105,8 @@ class ExecRequest(BaseModel):
 
 class RunResult(BaseModel):
     """Run result nested model."""
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     stdout: str = Field(default="", description="Standard output")
     stderr: str = Field(default="", description="Standard error")
     output: str = Field(default="", description="Combined stdout and stderr")
@@ -86,6 +121,8 @@ class RunResult(BaseModel):
 
 class ExecResult(BaseModel):
     """Result model for code execution."""
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
     language: str = Field(..., description="Programming language")
     version: str = Field(..., description="Language version")
     run: RunResult = Field(..., description="Execution results")
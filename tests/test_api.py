@@ -3,6 +3,8 @@ Test script for the refactored code execution engine.
 """
 import requests
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 BASE_URL = "http://localhost:8001"
 
@@ -126,6 +128,196 @@ def test_timeout():
     print(f"Time: {result.get('time')}s\n")
 
 
+def test_version_selection():
+    """Test that a partial version picks the highest installed release."""
+    print("Testing version selection...")
+    
+    runtimes = requests.get(f"{BASE_URL}/api/v2/runtimes").json()["runtimes"]
+    versions = [r["version"] for r in runtimes if r["language"] == "python"]
+    # Compare numerically, so that 3.10.0 ranks above 3.9.1
+    expected = max(versions, key=lambda v: tuple(int(p) for p in v.split(".")))
+    
+    payload = {
+        "language": "python",
+        "version": expected.split(".")[0],
+        "files": [
+            {
+                "name": "main.py",
+                "content": "import platform\nprint(platform.python_version())"
+            }
+        ],
+        "internet": False
+    }
+    
+    response = requests.post(f"{BASE_URL}/api/v2/execute", json=payload)
+    run = response.json()["run"]
+    print(f"Installed: {versions}")
+    print(f"Requested: {payload['version']}, expected: {expected}")
+    print(f"Selected: {run['stdout'].strip()}\n")
+
+
+
+def test_timeout_exit_code():
+    """Test that a job past its wall-clock limit reports exit code 124 and SIGKILL."""
+    print("Testing timeout exit code...")
+    
+    # Blocks without using CPU, so the wall-clock limit fires (not RLIMIT_CPU)
+    payload = {
+        "language": "python",
+        "version": "3.10",
+        "files": [
+            {
+                "name": "main.py",
+                "content": "import time\ntime.sleep(10)"
+            }
+        ],
+        "time_limit": 1.0,
+        "internet": False
+    }
+    
+    response = requests.post(f"{BASE_URL}/api/v2/execute", json=payload)
+    run = response.json()["run"]
+    print(f"Exit Code: {run['code']} (expected 124)")
+    print(f"Signal: {run['signal']} (expected SIGKILL)")
+    print(f"Stderr: {run['stderr']}")
+
+
+def test_timeout_with_background_child():
+    """Test a timeout while a background child keeps the output pipes open."""
+    print("Testing timeout with a lingering background child...")
+    
+    # The program exits at once, but sleep inherits stdout and stderr
+    payload = {
+        "language": "python",
+        "version": "3.10",
+        "files": [
+            {
+                "name": "main.py",
+                "content": "import subprocess\nsubprocess.Popen(['sleep', '20'])\nprint('bye')"
+            }
+        ],
+        "time_limit": 1.0,
+        "internet": False
+    }
+    
+    response = requests.post(f"{BASE_URL}/api/v2/execute", json=payload)
+    run = response.json()["run"]
+    print(f"Exit Code: {run['code']} (expected 124 in direct mode, 0 under bubblewrap)")
+    print(f"Stdout: {run['stdout']!r} (expected 'bye\\n')")
+    print(f"Stderr: {run['stderr']!r}\n")
+
+
+
+def test_output_truncation():
+    """Test that stdout is cut off at 512 KB with a notice."""
+    print("Testing output truncation...")
+    
+    payload = {
+        "language": "python",
+        "version": "3.10",
+        "files": [
+            {
+                "name": "main.py",
+                "content": "print('x' * 600000)"
+            }
+        ],
+        "internet": False
+    }
+    
+    response = requests.post(f"{BASE_URL}/api/v2/execute", json=payload)
+    run = response.json()["run"]
+    print(f"Exit Code: {run['code']}")
+    print(f"Stdout bytes: {len(run['stdout'].encode('utf-8'))} (expected 524288)")
+    print(f"Stdout tail: {run['stdout'][-60:]!r}\n")
+
+
+
+def test_warm_pool_fallback():
+    """Test that jobs beyond the warm pool's capacity take the cold path."""
+    print("Testing warm pool fallback...")
+    
+    def execute(index, args):
+        payload = {
+            "language": "python",
+            "version": "3.10",
+            "files": [
+                {
+                    "name": "main.py",
+                    "content": "import sys, time\ntime.sleep(0.5)\nprint(sys.argv[1], len(sys.argv[2]))"
+                }
+            ],
+            "args": [str(index), args],
+            "internet": False
+        }
+        return requests.post(f"{BASE_URL}/api/v2/execute", json=payload).json()["run"]
+    
+    # More concurrent jobs than WARM_POOL_SIZE, and one with arguments too
+    # long to hand to a warm worker; every job must still succeed
+    jobs = [(i, "a") for i in range(8)] + [(8, "a" * 5000)]
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        runs = list(pool.map(lambda job: execute(*job), jobs))
+    
+    print(f"Exit Codes: {[run['code'] for run in runs]} (expected all 0)")
+    print(f"Stdout: {[run['stdout'].strip() for run in runs]}\n")
+
+
+def test_quick_job_beside_long_warm_jobs():
+    """Test that long warm jobs do not hold up an unrelated quick job."""
+    print("Testing a quick job beside long warm jobs...")
+    
+    def execute(content):
+        payload = {
+            "language": "python",
+            "version": "3.10",
+            "files": [{"name": "main.py", "content": content}],
+            "internet": False
+        }
+        return requests.post(f"{BASE_URL}/api/v2/execute", json=payload).json()["run"]
+    
+    # Enough long jobs to occupy every thread of a small default executor
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        slow = [pool.submit(execute, "import time\ntime.sleep(4)") for _ in range(8)]
+        time.sleep(0.5)
+        start = time.time()
+        run = execute("print('quick')")
+        elapsed = time.time() - start
+        for future in slow:
+            future.result()
+    
+    print(f"Stdout: {run['stdout'].strip()}")
+    print(f"Quick job took {elapsed:.2f}s (expected well under 4s)\n")
+
+
+
+def test_warm_non_daemon_thread():
+    """Test that a warm worker waits for non-daemon threads before exiting."""
+    print("Testing a non-daemon thread on a warm worker...")
+    
+    code = """
+import threading
+import time
+
+def work():
+    time.sleep(0.5)
+    print("thread done")
+
+threading.Thread(target=work).start()
+print("main done")
+"""
+    
+    payload = {
+        "language": "python",
+        "version": "3.10",
+        "files": [{"name": "main.py", "content": code}],
+        "internet": False
+    }
+    
+    response = requests.post(f"{BASE_URL}/api/v2/execute", json=payload)
+    run = response.json()["run"]
+    print(f"Stdout: {run['stdout'].strip()}")
+    print(f"Exit code: {run['code']} (expected 0, with both lines printed)\n")
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print("Code Execution Engine - Test Suite")
@@ -138,6 +330,13 @@ if __name__ == "__main__":
         test_execute_with_stdin()
         test_error_handling()
         test_timeout()
+        test_version_selection()
+        test_timeout_exit_code()
+        test_timeout_with_background_child()
+        test_output_truncation()
+        test_warm_pool_fallback()
+        test_quick_job_beside_long_warm_jobs()
+        test_warm_non_daemon_thread()
         
         print("=" * 60)
         print("All tests completed!")